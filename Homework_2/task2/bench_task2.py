@@ -0,0 +1,204 @@
+# Бенчмарки для Задания 2 (Proxy / Facade над набором чисел).
+#
+# Генерирует синтетические файлы с числами заданных размеров и измеряет:
+# холодную загрузку, стоимость _check_updates, задержку доступа через
+# LoggingNumbersProxy, операции NumbersService и пропускную способность лога.
+# Результаты выводятся в JSON, чтобы сравнивать версии между собой:
+#
+#   python bench_task2.py --sizes 1e3,1e4,1e5,1e6 --output bench.json
+#   python bench_task2.py --sizes 1e3,1e4 --compare bench.json
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# task2 печатает заголовок задания при импорте — в JSON-вывод он не нужен
+with contextlib.redirect_stdout(io.StringIO()):
+    import task2
+
+
+# ======================================================
+# Генерация данных
+# ======================================================
+def generate_file(path: str, lines: int, seed: int = 42, chunk: int = 100_000) -> None:
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        written = 0
+        while written < lines:
+            n = min(chunk, lines - written)
+            f.write("\n".join(str(rng.randint(-10 ** 9, 10 ** 9)) for _ in range(n)))
+            f.write("\n")
+            written += n
+
+
+# ======================================================
+# Измерения
+# ======================================================
+def best_of(repeat: int, func: Callable[[], None]) -> float:
+    """Минимальное время выполнения func из repeat попыток, в секундах."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def per_call(calls: int, func: Callable[[], object]) -> float:
+    """Среднее время одного вызова func, в микросекундах."""
+    started = time.perf_counter()
+    for _ in range(calls):
+        func()
+    return (time.perf_counter() - started) / calls * 1e6
+
+
+def latency_percentiles(calls: int, func: Callable[[], object]) -> Dict[str, float]:
+    samples = []
+    for _ in range(calls):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1e6)
+    samples.sort()
+    return {
+        "mean_us": statistics.fmean(samples),
+        "p50_us": samples[len(samples) // 2],
+        "p99_us": samples[min(len(samples) - 1, len(samples) * 99 // 100)],
+    }
+
+
+def bench_size(lines: int, workdir: str, repeat: int, calls: int) -> Dict[str, object]:
+    path = os.path.join(workdir, f"numbers_{lines}.txt")
+    generate_file(path, lines)
+    result: Dict[str, object] = {"lines": lines, "file_bytes": os.path.getsize(path)}
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        result["cold_load_s"] = best_of(repeat, lambda: task2.FileNumbersSource(path))
+        source = task2.FileNumbersSource(path)
+        result["check_updates_us"] = per_call(calls, source._check_updates)
+
+        proxy = task2.LoggingNumbersProxy(source)
+        result["proxy_access"] = latency_percentiles(calls, proxy.get_numbers)
+        task2.AccessLogger().flush()
+
+        service = task2.NumbersService(proxy)
+        operations = {}
+        for name in ("total", "maximum", "minimum", "average", "count"):
+            operations[name + "_us"] = per_call(calls, getattr(service, name))
+        half = max(1, lines // 2)
+        operations["range_index_build_s"] = best_of(
+            1, lambda: task2.RangeIndex(source.get_numbers()))
+        service.total(0, half)
+        operations["range_total_us"] = per_call(calls, lambda: service.total(0, half))
+        operations["range_maximum_us"] = per_call(calls, lambda: service.maximum(0, half))
+        operations["window_us"] = per_call(calls, lambda: service.window(half))
+        result["service"] = operations
+        task2.AccessLogger().flush()
+    return result
+
+
+def bench_logger(messages: int) -> Dict[str, float]:
+    logger = task2.AccessLogger()
+    started = time.perf_counter()
+    for i in range(messages):
+        logger.log(f"Запрос доступа к набору чисел #{i}")
+    enqueued = time.perf_counter() - started
+    logger.flush()
+    total = time.perf_counter() - started
+    return {
+        "messages": messages,
+        "enqueue_per_s": messages / enqueued,
+        "written_per_s": messages / total,
+    }
+
+
+# ======================================================
+# Сравнение с предыдущим прогоном
+# ======================================================
+def flatten(prefix: str, value, out: Dict[str, float]) -> None:
+    if isinstance(value, dict):
+        for key, item in value.items():
+            flatten(f"{prefix}.{key}" if prefix else key, item, out)
+    elif isinstance(value, (int, float)):
+        out[prefix] = value
+
+
+def compare(current: dict, baseline: dict) -> List[str]:
+    """Отношения текущих метрик к базовым для совпадающих размеров (>1 — медленнее)."""
+    lines = []
+    base_by_size = {r["lines"]: r for r in baseline.get("results", [])}
+    for record in current["results"]:
+        base = base_by_size.get(record["lines"])
+        if base is None:
+            continue
+        now, before = {}, {}
+        flatten("", record, now)
+        flatten("", base, before)
+        for key in sorted(now):
+            if key.endswith(("_s", "_us")) and before.get(key):
+                lines.append(f"{record['lines']:>12} {key:<32} x{now[key] / before[key]:.2f}")
+    return lines
+
+
+# ======================================================
+# Точка входа
+# ======================================================
+def parse_sizes(text: str) -> List[int]:
+    return [int(float(part)) for part in text.split(",") if part.strip()]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Бенчмарки Задания 2")
+    parser.add_argument("--sizes", default="1e3,1e4,1e5,1e6",
+                        help="размеры файлов в строках через запятую (до 1e8)")
+    parser.add_argument("--repeat", type=int, default=3, help="повторов для холодной загрузки")
+    parser.add_argument("--calls", type=int, default=1000, help="вызовов на одну операцию")
+    parser.add_argument("--log-messages", type=int, default=100_000)
+    parser.add_argument("--output", help="куда записать JSON (по умолчанию stdout)")
+    parser.add_argument("--compare", help="JSON предыдущего прогона для сравнения")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="bench_task2_") as workdir:
+        task2.AccessLogger().configure(log_file=os.path.join(workdir, "access.log"), echo=False)
+        report = {
+            "meta": {
+                "timestamp": datetime.now().isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "calls": args.calls,
+                "repeat": args.repeat,
+            },
+            "results": [bench_size(n, workdir, args.repeat, args.calls)
+                        for n in parse_sizes(args.sizes)],
+            "logger": bench_logger(args.log_messages),
+        }
+        task2.AccessLogger().close()
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        print("\n".join(compare(report, baseline)), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -9,12 +9,129 @@ print("Задание №2 — Паттерн Proxy (доступ к числа
 print("-" * 50)
 
 from abc import ABC, abstractmethod
-from typing import List
+from array import array
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
+import asyncio
+import atexit
+import bisect
+from collections import OrderedDict
+from itertools import accumulate, islice
+import concurrent.futures
+import ctypes
+import ctypes.util
+import hashlib
+import io
+import mmap
 import os
+import queue
+import re
+import select
+import struct
+import sys
 import time
 from datetime import datetime
 from pathlib import Path
-from threading import Lock
+from threading import Event, Lock, RLock, Thread
+
+try:
+    import numpy as np
+except ImportError:  # NumPy нужен для NumpyNumbersSource / NumpyNumbersService, RangeIndex без него медленнее строится
+    np = None
+
+
+# Версия данных: (mtime в наносекундах, размер файла)
+DataVersion = Tuple[int, int]
+
+
+# ======================================================
+# Агрегаты набора чисел
+# ======================================================
+@dataclass(frozen=True)
+class NumbersStats:
+    total: int = 0
+    minimum: int = 0
+    maximum: int = 0
+    count: int = 0
+
+    @property
+    def average(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    @classmethod
+    def from_numbers(cls, numbers: Iterable[int]) -> "NumbersStats":
+        if isinstance(numbers, NumbersSnapshot):
+            numbers = numbers.view()
+        elif not isinstance(numbers, (list, tuple, array, memoryview)):
+            numbers = list(numbers)
+        if not len(numbers):
+            return cls()
+        return cls(sum(numbers), min(numbers), max(numbers), len(numbers))
+
+    def merge(self, other: "NumbersStats") -> "NumbersStats":
+        """Агрегаты объединения двух наборов (для дозагрузки хвоста файла)."""
+        if not other.count:
+            return self
+        if not self.count:
+            return other
+        return NumbersStats(self.total + other.total,
+                            min(self.minimum, other.minimum),
+                            max(self.maximum, other.maximum),
+                            self.count + other.count)
+
+
+# ======================================================
+# Неизменяемый снимок набора чисел
+# ======================================================
+class NumbersSnapshot:
+    """Read-only представление набора чисел поверх компактного буфера int64.
+
+    Снимок не копирует данные: он хранит ссылку на буфер (``array('q')``
+    и т.п.) и длину видимой части. Источник никогда не меняет уже выданную
+    часть буфера, поэтому снимок можно безопасно передавать между слоями.
+    ``version`` идентифицирует состояние файла, из которого получен снимок,
+    ``stats`` — агрегаты, посчитанные источником при загрузке (если есть).
+    """
+
+    __slots__ = ("_buffer", "_length", "version", "stats")
+
+    def __init__(self, buffer=None, length: Optional[int] = None,
+                 version: Optional[DataVersion] = None,
+                 stats: Optional[NumbersStats] = None):
+        if buffer is None:
+            buffer = array("q")
+        self._buffer = buffer
+        self._length = len(self._cast(buffer)) if length is None else length
+        self.version = version
+        self.stats = stats
+
+    @staticmethod
+    def _cast(buffer) -> memoryview:
+        return memoryview(buffer).cast("B").cast("q")
+
+    def view(self) -> memoryview:
+        """Zero-copy доступ к данным в виде read-only memoryview."""
+        return self._cast(self._buffer)[:self._length].toreadonly()
+
+    def tolist(self) -> List[int]:
+        return self.view().tolist()
+
+    def extends(self, other: "NumbersSnapshot") -> bool:
+        """Снимок — продолжение ``other``: тот же буфер и не меньшая длина
+        (выданная часть буфера не меняется, так что первые len(other) чисел совпадают)."""
+        return self._buffer is other._buffer and self._length >= other._length
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.view())
+
+    def __getitem__(self, index: Union[int, slice]):
+        return self.view()[index]
+
+    def __repr__(self) -> str:
+        return f"NumbersSnapshot(len={self._length})"
 
 
 # ======================================================
@@ -22,7 +139,7 @@ from threading import Lock
 # ======================================================
 class NumbersSource(ABC):
     @abstractmethod
-    def get_numbers(self) -> List[int]:
+    def get_numbers(self) -> NumbersSnapshot:
         pass
 
     @abstractmethod
@@ -30,46 +147,417 @@ class NumbersSource(ABC):
         pass
 
 
+# ======================================================
+# Разбор строк файла с числами
+# ======================================================
+INT64_MIN, INT64_MAX = -(1 << 63), (1 << 63) - 1
+
+
+def parse_numbers(lines: Iterable[str]) -> array:
+    """Целые числа из строк; строки, не являющиеся целым числом или не
+    помещающиеся в int64, пропускаются."""
+    numbers = array("q")
+    for line in lines:
+        line = line.strip()
+        if line.isdecimal() or (line.startswith("-") and line[1:].isdecimal()):
+            value = int(line)
+            # до 18 цифр число заведомо помещается в int64
+            if len(line) <= 18 or INT64_MIN <= value <= INT64_MAX:
+                numbers.append(value)
+    return numbers
+
+
+# ======================================================
+# Параллельный разбор больших файлов по диапазонам байт
+# ======================================================
+def split_ranges(filename: str, parts: int) -> List[Tuple[int, int]]:
+    """Делит файл на ``parts`` диапазонов байт, выровненных по границам строк."""
+    size = os.path.getsize(filename)
+    if size == 0:
+        return []
+    bounds = [0]
+    with open(filename, "rb") as f:
+        for i in range(1, parts):
+            target = max(size * i // parts, bounds[-1])
+            f.seek(target)
+            f.readline()  # дочитываем до конца строки, чтобы не резать её пополам
+            position = f.tell()
+            if position >= size:
+                break
+            if position > bounds[-1]:
+                bounds.append(position)
+    bounds.append(size)
+    return list(zip(bounds, bounds[1:]))
+
+
+def parse_range(filename: str, start: int, end: int) -> Tuple[array, NumbersStats]:
+    """Разбирает диапазон байт [start, end) — выполняется в процессе-воркере."""
+    with open(filename, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    # newline=None даёт те же универсальные переводы строк, что и текстовый open()
+    numbers = parse_numbers(io.StringIO(data.decode("utf-8"), newline=None))
+    return numbers, NumbersStats.from_numbers(numbers)
+
+
+def parse_numbers_parallel(filename: str, workers: int) -> Tuple[array, NumbersStats]:
+    """Разбор файла пулом процессов; результат совпадает с последовательным."""
+    ranges = split_ranges(filename, workers)
+    numbers, stats = array("q"), NumbersStats()
+    if not ranges:
+        return numbers, stats
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(parse_range, filename, start, end) for start, end in ranges]
+        # Части склеиваются в порядке диапазонов, а не завершения
+        for future in futures:
+            part, part_stats = future.result()
+            numbers.extend(part)
+            stats = stats.merge(part_stats)
+    return numbers, stats
+
+
+# ======================================================
+# Бинарный кэш рядом с файлом (sidecar)
+# ======================================================
+class NumbersSidecar:
+    """Бинарная копия разобранного файла: заголовок + массив int64.
+
+    Заголовок хранит mtime/размер исходного файла, хэш его начала и конца,
+    а также готовые агрегаты. Если ключ совпадает, данные отображаются в
+    память через mmap без разбора текста; иначе кэш перестраивается.
+    """
+
+    MAGIC = b"NUMS"
+    FORMAT_VERSION = 1
+    # magic, версия формата, резерв, mtime_ns, size, хэш, count, min, max, total (int128)
+    HEADER = struct.Struct("<4sHHqq16sqqq16s")
+    SAMPLE_SIZE = 64 * 1024
+
+    def __init__(self, source_path: str, path: Optional[str] = None):
+        self.source_path = source_path
+        self.path = path or source_path + ".nums"
+
+    def fingerprint(self, size: int) -> bytes:
+        digest = hashlib.blake2b(digest_size=16)
+        with open(self.source_path, "rb") as f:
+            digest.update(f.read(self.SAMPLE_SIZE))
+            if size > self.SAMPLE_SIZE:
+                f.seek(max(self.SAMPLE_SIZE, size - self.SAMPLE_SIZE))
+                digest.update(f.read(self.SAMPLE_SIZE))
+        return digest.digest()
+
+    def load(self, version: DataVersion) -> Optional[Tuple[memoryview, NumbersStats]]:
+        try:
+            with open(self.path, "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        if len(mapped) < self.HEADER.size:
+            return None
+        (magic, format_version, _, mtime_ns, size, fingerprint,
+         count, minimum, maximum, total) = self.HEADER.unpack_from(mapped)
+        if (magic != self.MAGIC or format_version != self.FORMAT_VERSION
+                or (mtime_ns, size) != version
+                or len(mapped) != self.HEADER.size + count * 8
+                or fingerprint != self.fingerprint(size)):
+            return None
+        stats = NumbersStats(int.from_bytes(total, "little", signed=True),
+                             minimum, maximum, count) if count else NumbersStats()
+        return memoryview(mapped)[self.HEADER.size:], stats
+
+    def save(self, version: DataVersion, numbers, stats: NumbersStats) -> None:
+        header = self.HEADER.pack(self.MAGIC, self.FORMAT_VERSION, 0, version[0], version[1],
+                                  self.fingerprint(version[1]), stats.count, stats.minimum,
+                                  stats.maximum, stats.total.to_bytes(16, "little", signed=True))
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(header)
+                f.write(memoryview(numbers).cast("B"))
+            # Атомарная замена: читатели видят либо старый, либо новый кэш целиком
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"⚠ Не удалось записать кэш {self.path}: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+
+# ======================================================
+# Ожидание изменений каталога через inotify (только Linux)
+# ======================================================
+class _InotifyWaiter:
+    IN_MODIFY = 0x002
+    IN_ATTRIB = 0x004
+    IN_CLOSE_WRITE = 0x008
+    IN_MOVED_TO = 0x080
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+
+    def __init__(self, filename: str):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        # Следим за каталогом: так видна и подмена файла через rename
+        directory = os.path.dirname(os.path.abspath(filename))
+        mask = (self.IN_MODIFY | self.IN_ATTRIB | self.IN_CLOSE_WRITE
+                | self.IN_MOVED_TO | self.IN_CREATE | self.IN_DELETE)
+        if libc.inotify_add_watch(self._fd, os.fsencode(directory), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self._fd)
+            raise OSError(errno, "inotify_add_watch failed")
+
+    @classmethod
+    def create(cls, filename: str) -> Optional["_InotifyWaiter"]:
+        if not sys.platform.startswith("linux"):
+            return None
+        try:
+            return cls(filename)
+        except (OSError, AttributeError):
+            return None
+
+    def wait(self, timeout: float) -> bool:
+        """Ждёт событие не дольше timeout секунд; True — были изменения."""
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return False
+        try:
+            while os.read(self._fd, 65536):
+                pass
+        except BlockingIOError:
+            pass
+        return True
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+
 # ======================================================
 # Реальный источник данных (чтение из файла)
 # ======================================================
 class FileNumbersSource(NumbersSource):
-    def __init__(self, filename: str):
+    """Источник чисел из текстового файла (одно число на строку).
+
+    В режиме ``append_only`` источник рассчитывает на то, что файл только
+    дописывается: при изменении читаются лишь новые полные строки после
+    запомненного смещения, а агрегаты обновляются инкрементально. Если файл
+    был подменён (другой inode), усечён или переписан (не совпадает участок
+    перед смещением), выполняется полная перезагрузка. Недописанная последняя
+    строка в этом режиме не учитывается, пока не появится перевод строки.
+
+    После ``start_watching()`` проверку файла выполняет фоновый поток, а
+    ``get_numbers()`` просто возвращает текущий снимок без системных вызовов.
+
+    При ``workers > 1`` полная загрузка файлов от ``PARALLEL_MIN_BYTES``
+    выполняется параллельно пулом процессов (см. ``parse_numbers_parallel``).
+
+    При ``sidecar=True`` результат полной загрузки сохраняется в бинарный
+    кэш рядом с файлом, и следующий запуск отображает его в память вместо
+    разбора текста (см. ``NumbersSidecar``).
+    """
+
+    # Сколько байт перед смещением сверяется, чтобы заметить перезапись файла
+    TAIL_FINGERPRINT_SIZE = 64
+    # Меньшие файлы быстрее разобрать в одном процессе, чем запускать пул
+    PARALLEL_MIN_BYTES = 8 * 1024 * 1024
+
+    def __init__(self, filename: str, append_only: bool = False, workers: int = 1,
+                 sidecar: bool = False):
         self.filename = filename
-        self._numbers: List[int] = []
-        self._last_modified = 0.0
+        self.append_only = append_only
+        self.workers = workers
+        self.sidecar = NumbersSidecar(filename) if sidecar else None
+        self._snapshot = NumbersSnapshot()
+        self._last_modified: Optional[DataVersion] = None
+        # Состояние для дозагрузки хвоста
+        self._numbers = array("q")
+        self._offset = 0
+        self._identity: Optional[Tuple[int, int]] = None
+        self._fingerprint = b""
+        # Фоновое наблюдение за файлом
+        self._reload_lock = RLock()
+        self._watcher: Optional[Thread] = None
+        self._stop_watching = Event()
+        self._loaded = False
         self.reload()
 
+    def _stat(self) -> Optional[os.stat_result]:
+        try:
+            return os.stat(self.filename)
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _version(st: os.stat_result) -> DataVersion:
+        return st.st_mtime_ns, st.st_size
+
     def reload(self) -> None:
-        if not os.path.exists(self.filename):
-            self._numbers = []
+        with self._reload_lock:
+            self._reload()
+
+    def _reload(self) -> None:
+        self._loaded = True
+        st = self._stat()
+        if st is None:
+            self._snapshot = NumbersSnapshot()
             return
 
-        self._last_modified = os.path.getmtime(self.filename)
-        self._numbers.clear()
+        self._last_modified = self._version(st)
+        if self.append_only:
+            self._numbers = array("q")
+            self._offset = 0
+            self._identity = (st.st_dev, st.st_ino)
+            self._fingerprint = b""
+            self._load_tail(NumbersStats())
+            return
+
+        # Новый буфер вместо clear(): ранее выданные снимки остаются валидными
+        cached = self.sidecar.load(self._last_modified) if self.sidecar else None
+        if cached is not None:
+            numbers, stats = cached
+        else:
+            numbers, stats = self._parse_file()
+            if self.sidecar:
+                self.sidecar.save(self._last_modified, numbers, stats)
+        self._snapshot = NumbersSnapshot(numbers, version=self._last_modified, stats=stats)
 
+    def _parse_file(self):
+        """Полный разбор файла: буфер int64 и агрегаты (считаются один раз на версию)."""
+        if self.workers > 1 and os.path.getsize(self.filename) >= self.PARALLEL_MIN_BYTES:
+            return parse_numbers_parallel(self.filename, self.workers)
         with open(self.filename, "r", encoding="utf-8") as f:
-            for line in f:
-                line = line.strip()
-                if line.isdigit() or (line.startswith("-") and line[1:].isdigit()):
-                    self._numbers.append(int(line))
+            numbers = parse_numbers(f)
+        return numbers, NumbersStats.from_numbers(numbers)
+
+    def _is_appended(self, st: os.stat_result) -> bool:
+        if (st.st_dev, st.st_ino) != self._identity or st.st_size < self._offset:
+            return False
+        start = max(0, self._offset - self.TAIL_FINGERPRINT_SIZE)
+        with open(self.filename, "rb") as f:
+            f.seek(start)
+            return f.read(self._offset - start) == self._fingerprint
+
+    def _load_tail(self, stats: NumbersStats) -> None:
+        with open(self.filename, "rb") as f:
+            f.seek(self._offset)
+            data = f.read()
+        # Берём только полные строки, остаток дочитаем при следующем обновлении
+        data = data[:data.rfind(b"\n") + 1]
+        if data:
+            tail = parse_numbers(io.StringIO(data.decode("utf-8"), newline=None))
+            try:
+                self._numbers.extend(tail)
+            except BufferError:
+                # Кто-то держит memoryview на буфер — продолжаем в копии
+                self._numbers = array("q", self._numbers)
+                self._numbers.extend(tail)
+            stats = stats.merge(NumbersStats.from_numbers(tail))
+            self._offset += len(data)
+            fingerprint = data[-self.TAIL_FINGERPRINT_SIZE:]
+            if len(fingerprint) < self.TAIL_FINGERPRINT_SIZE:
+                fingerprint = (self._fingerprint + fingerprint)[-self.TAIL_FINGERPRINT_SIZE:]
+            self._fingerprint = fingerprint
+        self._snapshot = NumbersSnapshot(self._numbers, len(self._numbers),
+                                         version=self._last_modified, stats=stats)
 
     def _check_updates(self):
-        if os.path.exists(self.filename):
-            current_time = os.path.getmtime(self.filename)
-            if current_time > self._last_modified:
-                print("📂 Обнаружены изменения файла, обновляем данные...")
-                self.reload()
+        # Один stat() вместо exists() + getmtime(); сравнение на неравенство
+        # ловит и перезапись файла с тем же mtime, но другим размером
+        st = self._stat()
+        if st is None or self._version(st) == self._last_modified:
+            return
+        with self._reload_lock:
+            if self._version(st) == self._last_modified:
+                return
+            print("📂 Обнаружены изменения файла, обновляем данные...")
+            if self.append_only and self._is_appended(st):
+                self._last_modified = self._version(st)
+                self._load_tail(self._snapshot.stats or NumbersStats())
+            else:
+                self._reload()
+
+    def unload(self) -> None:
+        """Освобождает загруженные данные; следующий доступ заново прочитает файл."""
+        with self._reload_lock:
+            self._loaded = False
+            self._snapshot = NumbersSnapshot()
+            self._last_modified = None
+            self._numbers = array("q")
+            self._offset = 0
+            self._identity = None
+            self._fingerprint = b""
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._loaded
 
-    def get_numbers(self) -> List[int]:
+    def get_numbers(self) -> NumbersSnapshot:
+        if not self._loaded:
+            with self._reload_lock:
+                if not self._loaded:
+                    self._reload()
+        elif self._watcher is None:
+            self._check_updates()
+        # Присваивание снимка атомарно: читатель видит либо старую, либо новую версию
+        return self._snapshot
+
+    # ----------------- Фоновое наблюдение -----------------
+    @property
+    def is_watching(self) -> bool:
+        return self._watcher is not None
+
+    def start_watching(self, interval: float = 1.0, use_inotify: bool = True) -> None:
+        """Запускает фоновый поток, обновляющий данные вне пути запроса.
+
+        При доступном inotify поток просыпается по событию файловой системы,
+        иначе (или дополнительно, раз в ``interval`` секунд) опрашивает stat().
+        """
+        if self._watcher is not None:
+            return
         self._check_updates()
-        return self._numbers.copy()
+        waiter = _InotifyWaiter.create(self.filename) if use_inotify else None
+        self._stop_watching.clear()
+        self._watcher = Thread(target=self._watch, args=(interval, waiter),
+                               name=f"numbers-watcher:{self.filename}", daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self) -> None:
+        watcher, self._watcher = self._watcher, None
+        if watcher is not None:
+            self._stop_watching.set()
+            watcher.join()
+
+    def _watch(self, interval: float, waiter: Optional[_InotifyWaiter]) -> None:
+        try:
+            while not self._stop_watching.is_set():
+                if waiter is not None:
+                    waiter.wait(interval)
+                elif self._stop_watching.wait(interval):
+                    break
+                try:
+                    self._check_updates()
+                except (OSError, ValueError, OverflowError) as e:
+                    print(f"⚠ Не удалось обновить данные: {e}")
+        finally:
+            if waiter is not None:
+                waiter.close()
 
 
 # ======================================================
 # Singleton Logger
 # ======================================================
 class AccessLogger:
+    """Singleton-логгер доступа с фоновой пакетной записью в файл.
+
+    ``log()`` только ставит запись в очередь (и, если включено, печатает её
+    в консоль). Фоновый поток держит файл открытым и сбрасывает накопленные
+    записи одним write(), когда набралось ``flush_every`` записей или
+    ``flush_bytes`` байт либо прошло ``flush_interval`` секунд. При выходе
+    из программы очередь дописывается до конца.
+    """
+
     _instance = None
     _lock = Lock()
 
@@ -79,59 +567,796 @@ class AccessLogger:
                 cls._instance = super().__new__(cls)
                 cls._instance.log_file = "numbers_access.log"
                 Path(cls._instance.log_file).touch(exist_ok=True)
+                cls._instance._init_writer()
             return cls._instance
 
+    def _init_writer(self):
+        self.echo = True
+        self.flush_every = 256
+        self.flush_bytes = 64 * 1024
+        self.flush_interval = 0.5
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._writer: Optional[Thread] = None
+        self._writer_lock = Lock()
+        self._stamp_cache: Tuple[int, str] = (-1, "")
+        atexit.register(self.close)
+
+    def configure(self, log_file: Optional[str] = None, echo: Optional[bool] = None,
+                  flush_every: Optional[int] = None, flush_bytes: Optional[int] = None,
+                  flush_interval: Optional[float] = None):
+        """Меняет настройки логгера; смена файла дописывает и закрывает старый."""
+        if log_file is not None and log_file != self.log_file:
+            self.close()
+            self.log_file = log_file
+            Path(self.log_file).touch(exist_ok=True)
+        if echo is not None:
+            self.echo = echo
+        if flush_every is not None:
+            self.flush_every = flush_every
+        if flush_bytes is not None:
+            self.flush_bytes = flush_bytes
+        if flush_interval is not None:
+            self.flush_interval = flush_interval
+
+    def _format(self, created: float, message: str) -> str:
+        # strftime — заметная часть стоимости записи, кэшируем её в пределах секунды
+        # (кортеж подменяется целиком, поэтому кэш безопасен между потоками)
+        second = int(created)
+        cached_second, timestamp = self._stamp_cache
+        if second != cached_second:
+            timestamp = datetime.fromtimestamp(second).strftime("%Y-%m-%d %H:%M:%S")
+            self._stamp_cache = (second, timestamp)
+        return f"[{timestamp}] {message}"
+
     def log(self, message: str):
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        record = f"[{timestamp}] {message}"
-        print(record)
+        created = time.time()
+        if self.echo:
+            print(self._format(created, message))
+        self._ensure_writer()
+        self._queue.put((created, message))
+
+    def flush(self):
+        """Блокируется, пока все поставленные в очередь записи не окажутся в файле."""
+        if self._writer is None:
+            return
+        done = Event()
+        self._queue.put(done)
+        done.wait()
+
+    def close(self):
+        """Дописывает очередь, останавливает фоновый поток и закрывает файл."""
+        with self._writer_lock:
+            writer, self._writer = self._writer, None
+            if writer is not None:
+                self._queue.put(None)
+                writer.join()
+
+    def _ensure_writer(self):
+        if self._writer is None:
+            with self._writer_lock:
+                if self._writer is None:
+                    self._writer = Thread(target=self._write_loop, name="access-logger", daemon=True)
+                    self._writer.start()
+
+    def _write_loop(self):
+        batch: List[str] = []
+        size = 0
+        deadline = None
         with open(self.log_file, "a", encoding="utf-8") as f:
-            f.write(record + "\n")
+            while True:
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    item = ()
+                if isinstance(item, tuple) and item:
+                    record = self._format(*item) + "\n"
+                    batch.append(record)
+                    size += len(record)
+                    if deadline is None:
+                        deadline = time.monotonic() + self.flush_interval
+                    if len(batch) < self.flush_every and size < self.flush_bytes:
+                        continue
+                if batch:
+                    f.write("".join(batch))
+                    f.flush()
+                    batch.clear()
+                    size = 0
+                deadline = None
+                if isinstance(item, Event):
+                    item.set()
+                elif item is None:
+                    return
+
+
+# ======================================================
+# Метрики доступа
+# ======================================================
+class LatencyHistogram:
+    """Гистограмма задержек с логарифмическими корзинами (1-2-5 на декаду)."""
+
+    # Верхние границы корзин в секундах: 1 мкс ... 50 с
+    BOUNDS = [round(m * 10.0 ** e, 6) for e in range(-6, 2) for m in (1, 2, 5)]
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def record(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(self.BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+
+    def percentile(self, q: float) -> float:
+        """Оценка q-го перцентиля (0..100) сверху — граница корзины, в секундах."""
+        if not self.count:
+            return 0.0
+        rank = max(1, -(-self.count * q // 100))
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return self.BOUNDS[i] if i < len(self.BOUNDS) else float("inf")
+        return float("inf")
+
+
+@dataclass(frozen=True)
+class AccessMetrics:
+    accesses: int
+    reloads: int
+    values_returned: int
+    logged: int
+    suppressed: int
+    mean_ms: float
+    p50_ms: float
+    p99_ms: float
 
 
 # ======================================================
 # Proxy для логирования
 # ======================================================
 class LoggingNumbersProxy(NumbersSource):
-    def __init__(self, real_source: NumbersSource):
+    """Proxy, логирующий доступ к источнику и собирающий метрики.
+
+    Счётчики и гистограмма задержек реального источника ведутся всегда и
+    доступны через ``metrics()``. Текстовый лог можно проредить: писать
+    каждый ``sample_every``-й доступ и не больше ``max_logs_per_second``
+    доступов в секунду. Пропущенные записи учитываются в следующей.
+    """
+
+    def __init__(self, real_source: NumbersSource, sample_every: int = 1,
+                 max_logs_per_second: Optional[float] = None):
         self._real_source = real_source
         self._logger = AccessLogger()
+        self.sample_every = max(1, sample_every)
+        self.max_logs_per_second = max_logs_per_second
+        self._metrics_lock = Lock()
+        self._latency = LatencyHistogram()
+        self._accesses = 0
+        self._reloads = 0
+        self._values_returned = 0
+        self._logged = 0
+        self._suppressed = 0
+        self._last_version: Optional[DataVersion] = None
+        self._window_start = 0.0
+        self._window_logs = 0
 
-    def get_numbers(self) -> List[int]:
-        self._logger.log("Запрос доступа к набору чисел")
+    def _should_log(self) -> Tuple[bool, int]:
+        # Вызывается под _metrics_lock; возвращает (писать ли, сколько пропущено)
+        if (self._accesses - 1) % self.sample_every:
+            self._suppressed += 1
+            return False, 0
+        if self.max_logs_per_second is not None:
+            now = time.monotonic()
+            if now - self._window_start >= 1.0:
+                self._window_start, self._window_logs = now, 0
+            if self._window_logs >= self.max_logs_per_second:
+                self._suppressed += 1
+                return False, 0
+            self._window_logs += 1
+        skipped, self._suppressed = self._suppressed, 0
+        self._logged += 1
+        return True, skipped
+
+    def get_numbers(self) -> NumbersSnapshot:
+        with self._metrics_lock:
+            self._accesses += 1
+            log_access, skipped = self._should_log()
+        if log_access:
+            suffix = f" (пропущено записей: {skipped})" if skipped else ""
+            self._logger.log("Запрос доступа к набору чисел" + suffix)
+        started = time.perf_counter()
         numbers = self._real_source.get_numbers()
-        self._logger.log(f"Получено чисел: {len(numbers)}")
+        elapsed = time.perf_counter() - started
+        with self._metrics_lock:
+            self._latency.record(elapsed)
+            self._values_returned += len(numbers)
+            # Смена версии снимка означает, что источник перечитал файл
+            if numbers.version != self._last_version:
+                if self._last_version is not None:
+                    self._reloads += 1
+                self._last_version = numbers.version
+        if log_access:
+            self._logger.log(f"Получено чисел: {len(numbers)}")
         return numbers
 
     def reload(self) -> None:
         self._logger.log("Принудительное обновление данных")
         self._real_source.reload()
+        with self._metrics_lock:
+            self._reloads += 1
+            self._last_version = None
+
+    def metrics(self) -> AccessMetrics:
+        with self._metrics_lock:
+            latency = self._latency
+            mean = latency.total / latency.count if latency.count else 0.0
+            return AccessMetrics(
+                accesses=self._accesses,
+                reloads=self._reloads,
+                values_returned=self._values_returned,
+                logged=self._logged,
+                suppressed=self._suppressed,
+                mean_ms=mean * 1000,
+                p50_ms=latency.percentile(50) * 1000,
+                p99_ms=latency.percentile(99) * 1000,
+            )
+
+
+# ======================================================
+# Реестр источников (Factory + LRU загруженных наборов)
+# ======================================================
+class _TrackedNumbersSource(NumbersSource):
+    """Внутренний proxy: сообщает реестру о каждом обращении к источнику."""
+
+    def __init__(self, registry: "NumbersSourceRegistry", path: str, source: FileNumbersSource):
+        self._registry = registry
+        self._path = path
+        self.source = source
+
+    def get_numbers(self) -> NumbersSnapshot:
+        numbers = self.source.get_numbers()
+        self._registry._touch(self._path, len(numbers))
+        return numbers
+
+    def reload(self) -> None:
+        self.source.reload()
+        self._registry._touch(self._path, len(self.source.get_numbers()))
+
+
+class NumbersSourceRegistry:
+    """Выдаёт логирующие proxy-источники по пути к файлу.
+
+    Для каждого файла создаётся одна цепочка
+    ``LoggingNumbersProxy -> _TrackedNumbersSource -> FileNumbersSource``;
+    все proxy пишут в общий singleton ``AccessLogger``. Загруженные наборы
+    держатся в LRU, ограниченном суммарным числом значений и/или байт:
+    при превышении у самых давно использованных источников вызывается
+    ``unload()``, а данные перечитываются при следующем обращении.
+    """
+
+    BYTES_PER_VALUE = 8
+
+    def __init__(self, max_values: Optional[int] = None, max_bytes: Optional[int] = None,
+                 source_factory=FileNumbersSource, proxy_options: Optional[dict] = None,
+                 **source_options):
+        self.max_values = max_values
+        self.max_bytes = max_bytes
+        self._source_factory = source_factory
+        self._proxy_options = proxy_options or {}
+        self._source_options = source_options
+        self._proxies: dict = {}
+        self._sources: dict = {}
+        self._loaded: "OrderedDict[str, int]" = OrderedDict()
+        self._loaded_values = 0
+        self._lock = RLock()
+
+    @staticmethod
+    def _key(path: str) -> str:
+        return os.path.abspath(path)
+
+    def get(self, path: str) -> LoggingNumbersProxy:
+        key = self._key(path)
+        with self._lock:
+            proxy = self._proxies.get(key)
+        if proxy is not None:
+            return proxy
+        # Файл читается без блокировки: иначе холодная загрузка одного файла
+        # задерживает _touch у всех остальных прокси
+        source = self._source_factory(path, **self._source_options)
+        count = len(source.get_numbers())
+        with self._lock:
+            proxy = self._proxies.get(key)
+            if proxy is None:  # другой поток мог успеть зарегистрировать свой
+                tracked = _TrackedNumbersSource(self, key, source)
+                proxy = LoggingNumbersProxy(tracked, **self._proxy_options)
+                self._proxies[key] = proxy
+                self._sources[key] = source
+                self._touch(key, count)
+            return proxy
+
+    def __contains__(self, path: str) -> bool:
+        return self._key(path) in self._proxies
+
+    def __len__(self) -> int:
+        return len(self._proxies)
+
+    @property
+    def loaded_paths(self) -> List[str]:
+        """Пути загруженных наборов, от давно использованного к недавнему."""
+        with self._lock:
+            return list(self._loaded)
+
+    @property
+    def loaded_values(self) -> int:
+        return self._loaded_values
+
+    def _over_limit(self) -> bool:
+        if self.max_values is not None and self._loaded_values > self.max_values:
+            return True
+        return (self.max_bytes is not None
+                and self._loaded_values * self.BYTES_PER_VALUE > self.max_bytes)
+
+    def _touch(self, key: str, values: int) -> None:
+        with self._lock:
+            self._loaded_values += values - self._loaded.get(key, 0)
+            self._loaded[key] = values
+            self._loaded.move_to_end(key)
+            # Последний использованный набор не вытесняем, даже если он один превышает лимит
+            while len(self._loaded) > 1 and self._over_limit():
+                cold_key = next(iter(self._loaded))
+                self._unload(cold_key)
+
+    def _unload(self, key: str) -> None:
+        self._loaded_values -= self._loaded.pop(key)
+        self._sources[key].unload()
+
+    def evict(self, path: str) -> None:
+        key = self._key(path)
+        with self._lock:
+            if key in self._loaded:
+                self._unload(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            for key in list(self._loaded):
+                self._unload(key)
 
 
 # ======================================================
 # Facade — операции над числами
 # ======================================================
-class NumbersService:
+class _VersionedStatsCache:
+    """Кэш агрегатов: считается один раз на версию данных."""
+
+    def __init__(self):
+        self._stats: Optional[NumbersStats] = None
+        self._stats_version: Optional[DataVersion] = None
+
+    def _compute_stats(self, nums: NumbersSnapshot) -> NumbersStats:
+        return nums.stats if nums.stats is not None else NumbersStats.from_numbers(nums)
+
+    def _stats_for(self, nums: NumbersSnapshot) -> NumbersStats:
+        version = nums.version
+        if self._stats is None or version is None or version != self._stats_version:
+            self._stats = self._compute_stats(nums)
+            self._stats_version = version
+        return self._stats
+
+
+class RangeIndex:
+    """Индекс для запросов по диапазону позиций.
+
+    Префиксные суммы дают сумму и среднее за O(1), деревья отрезков для
+    минимума и максимума — O(log n) на запрос. Деревья хранятся с запасом
+    (листья с позиции ``capacity`` — степени двойки, свободные заполнены
+    нейтральным значением) и строятся по уровням, с NumPy — векторно.
+    ``extend`` дописывает числа в конец за O(k + log n) без перестройки;
+    уже идущие запросы по старой длине при этом остаются корректными: они
+    читают только узлы, целиком лежащие в старой части.
+    """
+
+    def __init__(self, nums: NumbersSnapshot):
+        self.size = 0
+        self._prefix: Union[array, List[int]] = array("q", [0])
+        self._trees = (1, array("q", [INT64_MAX] * 2), array("q", [INT64_MIN] * 2))
+        self.extend(nums.view())
+
+    @staticmethod
+    def _build_tree(leaves: array, capacity: int, fill: int, func) -> array:
+        tree = array("q", [fill]) * (2 * capacity)
+        tree[capacity:capacity + len(leaves)] = leaves
+        if np is not None:
+            levels = np.frombuffer(tree, dtype=np.int64)
+            reduce = np.minimum if func is min else np.maximum
+            width = capacity
+            while width > 1:
+                half = width // 2
+                reduce(levels[width::2][:half], levels[width + 1::2][:half], out=levels[half:width])
+                width = half
+            return tree
+        width = capacity
+        while width > 1:
+            half = width // 2
+            children = tree[width:2 * width]
+            tree[half:width] = array("q", map(func, children[::2], children[1::2]))
+            width = half
+        return tree
+
+    @staticmethod
+    def _update_tree(tree: array, lo: int, hi: int, func) -> None:
+        """Пересчитывает предков листьев [lo, hi] (номера узлов)."""
+        lo >>= 1
+        hi >>= 1
+        while lo:
+            for i in range(lo, hi + 1):
+                tree[i] = func(tree[2 * i], tree[2 * i + 1])
+            lo >>= 1
+            hi >>= 1
+
+    def extend(self, values) -> None:
+        """Дописывает в индекс числа, добавленные в конец набора."""
+        leaves = array("q")
+        leaves.frombytes(memoryview(values).cast("B"))
+        if not leaves:
+            return
+        old, new = self.size, self.size + len(leaves)
+        capacity, min_tree, max_tree = self._trees
+        if new > capacity:
+            # Места не хватает — дерево вдвое больше строится заново (амортизированно O(1))
+            stored = min_tree[capacity:capacity + old]
+            stored.extend(leaves)
+            while capacity < new:
+                capacity *= 2
+            self._trees = (capacity,
+                           self._build_tree(stored, capacity, INT64_MAX, min),
+                           self._build_tree(stored, capacity, INT64_MIN, max))
+        else:
+            for tree, func in ((min_tree, min), (max_tree, max)):
+                tree[capacity + old:capacity + new] = leaves
+                self._update_tree(tree, capacity + old, capacity + new - 1, func)
+        _, min_tree, max_tree = self._trees
+        # Префиксные суммы в int64, пока переполнение невозможно, дальше — точные int
+        prefix = self._prefix
+        if isinstance(prefix, array) and max(abs(min_tree[1]), abs(max_tree[1])) * new >= 2 ** 63:
+            prefix = list(prefix)
+        if isinstance(prefix, array) and np is not None:
+            sums = np.cumsum(np.frombuffer(leaves, dtype=np.int64)) + prefix[-1]
+            prefix.frombytes(sums.tobytes())
+        else:
+            prefix.extend(islice(accumulate(leaves, initial=prefix[-1]), 1, None))
+        self._prefix = prefix
+        self.size = new
+
+    def _query(self, trees, tree: array, lo: int, hi: int, func) -> int:
+        capacity = trees[0]
+        lo += capacity
+        hi += capacity
+        result = tree[lo]
+        while lo < hi:
+            if lo & 1:
+                result = func(result, tree[lo])
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                result = func(result, tree[hi])
+            lo >>= 1
+            hi >>= 1
+        return result
+
+    def stats(self, start: Optional[int] = None, stop: Optional[int] = None,
+              size: Optional[int] = None) -> NumbersStats:
+        """Агрегаты для среза [start:stop] (индексы как у срезов Python) по
+        первым ``size`` числам (по умолчанию — по всем)."""
+        lo, hi, _ = slice(start, stop).indices(self.size if size is None else min(size, self.size))
+        if lo >= hi:
+            return NumbersStats()
+        trees = self._trees
+        return NumbersStats(self._prefix[hi] - self._prefix[lo],
+                            self._query(trees, trees[1], lo, hi, min),
+                            self._query(trees, trees[2], lo, hi, max),
+                            hi - lo)
+
+
+class NumbersService(_VersionedStatsCache):
+    """Facade операций над числами.
+
+    Без аргументов операции работают со всем набором (агрегаты кэшируются
+    на версию данных). С ``start``/``stop`` — со срезом, через ``RangeIndex``,
+    который строится лениво при первом запросе по диапазону и тоже
+    кэшируется на версию; если новый снимок лишь дописан в конец прежнего
+    (режим ``append_only``), индекс дополняется, а не строится заново.
+    """
+
     def __init__(self, source: NumbersSource):
+        super().__init__()
         self.source = source
+        self._range_index: Optional[RangeIndex] = None
+        self._range_snapshot: Optional[NumbersSnapshot] = None
+        self._range_lock = Lock()
 
-    def total(self) -> int:
-        return sum(self.source.get_numbers())
+    def stats(self) -> NumbersStats:
+        return self._stats_for(self.source.get_numbers())
 
-    def maximum(self) -> int:
+    def range_stats(self, start: Optional[int] = None, stop: Optional[int] = None) -> NumbersStats:
         nums = self.source.get_numbers()
-        return max(nums) if nums else 0
+        if start is None and stop is None:
+            return self._stats_for(nums)
+        with self._range_lock:
+            index, previous = self._range_index, self._range_snapshot
+            if (index is None or nums.version is None
+                    or not (nums.extends(previous) or previous.extends(nums))):
+                self._range_index = index = RangeIndex(nums)
+                self._range_snapshot = nums
+            elif len(nums) > index.size:
+                index.extend(nums.view()[index.size:])
+                self._range_snapshot = nums
+        # Индекс мог уже дорасти до более нового снимка — считаем по длине своего
+        return index.stats(start, stop, len(nums))
 
-    def minimum(self) -> int:
-        nums = self.source.get_numbers()
-        return min(nums) if nums else 0
+    def window(self, size: int) -> NumbersStats:
+        """Агрегаты скользящего окна из последних ``size`` значений."""
+        if size <= 0:
+            return NumbersStats()
+        return self.range_stats(-size, None)
 
-    def average(self) -> float:
+    def total(self, start: Optional[int] = None, stop: Optional[int] = None) -> int:
+        return self.range_stats(start, stop).total
+
+    def maximum(self, start: Optional[int] = None, stop: Optional[int] = None) -> int:
+        return self.range_stats(start, stop).maximum
+
+    def minimum(self, start: Optional[int] = None, stop: Optional[int] = None) -> int:
+        return self.range_stats(start, stop).minimum
+
+    def average(self, start: Optional[int] = None, stop: Optional[int] = None) -> float:
+        return self.range_stats(start, stop).average
+
+    def count(self, start: Optional[int] = None, stop: Optional[int] = None) -> int:
+        return self.range_stats(start, stop).count
+
+
+# ======================================================
+# Asyncio-вариант: источник, proxy и фасад
+# ======================================================
+class AsyncNumbersSource(ABC):
+    @abstractmethod
+    async def get_numbers(self) -> NumbersSnapshot:
+        pass
+
+    @abstractmethod
+    async def reload(self) -> None:
+        pass
+
+
+class AsyncFileNumbersSource(AsyncNumbersSource):
+    """Adapter синхронного FileNumbersSource для asyncio.
+
+    Проверка файла и перечитывание выполняются в пуле потоков, поэтому не
+    блокируют event loop. Запросы, пришедшие, пока проверка или перезагрузка
+    уже идёт, ждут её результата, а не запускают свою.
+    """
+
+    def __init__(self, source: FileNumbersSource):
+        self._source = source
+        self._pending_access: Optional[asyncio.Future] = None
+        self._pending_reload: Optional[asyncio.Future] = None
+
+    @classmethod
+    async def create(cls, filename: str, **options) -> "AsyncFileNumbersSource":
+        """Создаёт источник, выполняя первичную загрузку файла вне event loop."""
+        return cls(await asyncio.to_thread(FileNumbersSource, filename, **options))
+
+    async def _coalesce(self, attr: str, func):
+        pending = getattr(self, attr)
+        if pending is None:
+            pending = asyncio.ensure_future(asyncio.to_thread(func))
+            setattr(self, attr, pending)
+            pending.add_done_callback(lambda _: setattr(self, attr, None))
+        # shield: отмена одного ожидающего не отменяет общую операцию
+        return await asyncio.shield(pending)
+
+    async def get_numbers(self) -> NumbersSnapshot:
+        if self._source.is_watching:
+            # Файл отслеживает фоновый поток — снимок уже актуален
+            return self._source.get_numbers()
+        return await self._coalesce("_pending_access", self._source.get_numbers)
+
+    async def reload(self) -> None:
+        await self._coalesce("_pending_reload", self._source.reload)
+
+
+class AsyncLoggingNumbersProxy(AsyncNumbersSource):
+    def __init__(self, real_source: AsyncNumbersSource):
+        self._real_source = real_source
+        # log() лишь ставит запись в очередь фонового писателя
+        self._logger = AccessLogger()
+
+    async def get_numbers(self) -> NumbersSnapshot:
+        self._logger.log("Запрос доступа к набору чисел")
+        numbers = await self._real_source.get_numbers()
+        self._logger.log(f"Получено чисел: {len(numbers)}")
+        return numbers
+
+    async def reload(self) -> None:
+        self._logger.log("Принудительное обновление данных")
+        await self._real_source.reload()
+
+
+class AsyncNumbersService(_VersionedStatsCache):
+    def __init__(self, source: AsyncNumbersSource):
+        super().__init__()
+        self.source = source
+
+    async def stats(self) -> NumbersStats:
+        return self._stats_for(await self.source.get_numbers())
+
+    async def total(self) -> int:
+        return (await self.stats()).total
+
+    async def maximum(self) -> int:
+        return (await self.stats()).maximum
+
+    async def minimum(self) -> int:
+        return (await self.stats()).minimum
+
+    async def average(self) -> float:
+        return (await self.stats()).average
+
+    async def count(self) -> int:
+        return (await self.stats()).count
+
+
+# ======================================================
+# NumPy-движок: векторный разбор файла и расширенная статистика
+# ======================================================
+def _require_numpy():
+    if np is None:
+        raise ImportError("Для NumPy-движка требуется пакет numpy")
+
+
+def numpy_stats(values) -> NumbersStats:
+    if not len(values):
+        return NumbersStats()
+    total = int(values.sum())
+    # int64-сумма numpy молча переполняется — при больших модулях считаем точно
+    if abs(float(values.sum(dtype=np.float64))) >= 2.0 ** 62:
+        total = sum(values.tolist())
+    return NumbersStats(total, int(values.min()), int(values.max()), len(values))
+
+
+class NumpyNumbersSource(FileNumbersSource):
+    """Файловый источник, разбирающий файл сразу в массив NumPy.
+
+    Чистый файл (в строках только целые до 18 цифр) проверяется векторно
+    над байтами и разбирается целиком в C через ``np.fromstring``. Иначе
+    подходящие строки выбираются регулярным выражением и разбираются тем же
+    ``np.fromstring``, а для не-ASCII текста (где правила
+    ``str.strip``/``str.isdecimal`` шире) используется обычный разбор —
+    при ``workers > 1`` параллельный. Набор принятых строк в любом случае
+    совпадает с ``parse_numbers``.
+    """
+
+    # До 18 цифр число заведомо помещается в int64
+    _MAX_DIGITS = 18
+    _CLEAN_BYTES = b"0123456789-\r\n"
+    # Пробельные символы, которые снимает str.strip() в ASCII (кроме \n)
+    _NUMBER_LINE = re.compile(r"^[\t\x0b\x0c\x1c-\x1f ]*(-?[0-9]+)[\t\x0b\x0c\x1c-\x1f ]*$",
+                              re.MULTILINE)
+
+    def __init__(self, filename: str, append_only: bool = False, workers: int = 1,
+                 sidecar: bool = False):
+        _require_numpy()
+        super().__init__(filename, append_only=append_only, workers=workers, sidecar=sidecar)
+
+    @classmethod
+    def _is_clean(cls, data: bytes) -> bool:
+        """Только цифры, переводы строк и минус в начале строки перед цифрой;
+        пустые строки допустимы — их, как и parse_numbers, пропустит fromstring."""
+        if data.translate(None, cls._CLEAN_BYTES):
+            return False
+        raw = np.frombuffer(data, dtype=np.uint8)
+        digits = (raw >= ord("0")) & (raw <= ord("9"))
+        minus = np.flatnonzero(raw == ord("-"))
+        if len(minus):
+            if minus[-1] == len(raw) - 1 or not digits[minus + 1].all():
+                return False
+            if not np.isin(raw[minus[minus > 0] - 1], (ord("\n"), ord("\r"))).all():
+                return False
+        # Границы серий цифр: длина самой длинной серии
+        edges = np.flatnonzero(np.diff(digits, prepend=False, append=False))
+        return not len(edges) or int((edges[1::2] - edges[::2]).max()) <= cls._MAX_DIGITS
+
+    def _parse_file(self):
+        with open(self.filename, "rb") as f:
+            data = f.read()
+        if self._is_clean(data):
+            # fromstring читает строку из одних пробелов как [0]
+            values = np.empty(0, dtype=np.int64) if data.isspace() \
+                else np.fromstring(data, dtype=np.int64, sep=" ")
+            return values, numpy_stats(values)
+        text = io.StringIO(data.decode("utf-8"), newline=None).read()
+        if text.isascii():
+            matches = self._NUMBER_LINE.findall(text)
+            if not matches:
+                values = np.empty(0, dtype=np.int64)
+            elif max(map(len, matches)) <= self._MAX_DIGITS:
+                values = np.fromstring(" ".join(matches), dtype=np.int64, sep=" ")
+            else:
+                values = np.frombuffer(parse_numbers(matches), dtype=np.int64)
+        elif self.workers > 1 and len(data) >= self.PARALLEL_MIN_BYTES:
+            numbers, stats = parse_numbers_parallel(self.filename, self.workers)
+            return np.frombuffer(numbers, dtype=np.int64), stats
+        else:
+            values = np.frombuffer(parse_numbers(io.StringIO(text)), dtype=np.int64)
+        return values, numpy_stats(values)
+
+
+class NumpyNumbersService(NumbersService):
+    """Фасад с векторной статистикой поверх того же версионного снимка.
+
+    Работает с любым источником: данные снимка оборачиваются в массив NumPy
+    без копирования. Отсортированная копия, нужная для медианы, перцентилей
+    и top-k, строится один раз на версию данных.
+    """
+
+    def __init__(self, source: NumbersSource):
+        _require_numpy()
+        super().__init__(source)
+        self._sorted = None
+        self._sorted_version: Optional[DataVersion] = None
+
+    def values(self):
+        """Текущие данные как read-only массив NumPy (без копирования)."""
+        return np.frombuffer(self.source.get_numbers().view(), dtype=np.int64)
+
+    def _compute_stats(self, nums: NumbersSnapshot) -> NumbersStats:
+        if nums.stats is not None:
+            return nums.stats
+        return numpy_stats(np.frombuffer(nums.view(), dtype=np.int64))
+
+    def _sorted_values(self):
         nums = self.source.get_numbers()
-        return sum(nums) / len(nums) if nums else 0.0
+        version = nums.version
+        if self._sorted is None or version is None or version != self._sorted_version:
+            self._sorted = np.sort(np.frombuffer(nums.view(), dtype=np.int64))
+            self._sorted_version = version
+        return self._sorted
+
+    def median(self) -> float:
+        values = self._sorted_values()
+        return float(np.median(values)) if len(values) else 0.0
+
+    def percentile(self, q: float) -> float:
+        values = self._sorted_values()
+        return float(np.percentile(values, q)) if len(values) else 0.0
+
+    def percentiles(self, qs: Iterable[float]) -> List[float]:
+        values = self._sorted_values()
+        qs = list(qs)
+        if not len(values):
+            return [0.0] * len(qs)
+        return np.percentile(values, qs).tolist()
+
+    def variance(self, ddof: int = 0) -> float:
+        values = self.values()
+        return float(values.var(ddof=ddof)) if len(values) > ddof else 0.0
+
+    def stddev(self, ddof: int = 0) -> float:
+        return self.variance(ddof) ** 0.5
+
+    def histogram(self, bins: int = 10) -> Tuple[List[int], List[float]]:
+        values = self.values()
+        if not len(values):
+            return [], []
+        counts, edges = np.histogram(values, bins=bins)
+        return counts.tolist(), edges.tolist()
 
-    def count(self) -> int:
-        return len(self.source.get_numbers())
+    def top_k(self, k: int) -> List[int]:
+        """k наибольших значений по убыванию."""
+        values = self._sorted_values()
+        return values[::-1][:k].tolist() if k > 0 else []
 
 
 # ======================================================
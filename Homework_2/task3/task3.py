@@ -5,10 +5,30 @@
 # максимально возможное количество паттернов проектирования.
 
 from abc import ABC, abstractmethod
-from dataclasses import dataclass
-from typing import List, Optional, Dict, Any
+from dataclasses import dataclass, asdict, fields
+from typing import List, Optional, Dict, Any, Set, Tuple, Union, Iterable
+from collections import Counter, deque
+from contextlib import contextmanager, nullcontext, redirect_stdout
+from functools import wraps
+from array import array
+from itertools import groupby, islice
+from operator import itemgetter
+from threading import Condition, Event, Lock, RLock, Thread, get_ident, local
+import atexit
+import bisect
+import csv
+import gc
+import heapq
 import json
 import logging
+import math
+import os
+import queue
+import random
+import re
+import sqlite3
+import sys
+import time
 from enum import Enum
 
 # ==================== Настройка логирования ====================
@@ -23,28 +43,110 @@ def log(message: str):
     logging.info(message)
     print(f"[LOG] {message}")
 
+def log_batch(messages: List[str]):
+    for message in messages:
+        logging.info(message)
+    print("\n".join(f"[LOG] {message}" for message in messages))
+
 # ==================== ПАТТЕРН: COMMAND ====================
 class Command(ABC):
     @abstractmethod
     def execute(self) -> None:
         pass
 
+    @abstractmethod
+    def undo(self) -> None:
+        """Отменяет результат execute (нужно для отката пакета команд)."""
+
 # ==================== ПАТТЕРН: OBSERVER ====================
 class Observer(ABC):
     @abstractmethod
     def update(self, message: str) -> None:
         pass
 
+    def update_batch(self, messages: List[str]) -> None:
+        """Пачка событий из фоновой доставки; по умолчанию — по одному."""
+        for message in messages:
+            self.update(message)
+
 class ConsoleLogger(Observer):
     def update(self, message: str) -> None:
         print(f"[OBS] {message}")
 
+    def update_batch(self, messages: List[str]) -> None:
+        print("\n".join(f"[OBS] {message}" for message in messages))
+
+class EventDispatcher:
+    """Фоновая доставка событий наблюдателям (по образцу QueueHandler/QueueListener).
+
+    ``dispatch`` только кладёт сообщение в очередь. Поток-слушатель забирает
+    всё накопившееся (до ``batch_size`` за раз), пишет пачку в лог и
+    передаёт её каждому наблюдателю через ``update_batch``. ``flush``
+    ждёт доставки всех отправленных ранее событий.
+    """
+
+    _STOP = None
+
+    def __init__(self, observers: List[Observer], batch_size: int = 1000):
+        self.observers = observers  # общий список с фасадом: add_observer виден сразу
+        self.batch_size = batch_size
+        self.delivered = 0
+        self.batches = 0
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread = Thread(target=self._run, name='library-events', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def dispatch(self, message: str):
+        self._queue.put(message)
+
+    def _run(self):
+        while True:
+            items = [self._queue.get()]
+            while len(items) < self.batch_size:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            messages = [item for item in items if isinstance(item, str)]
+            if messages:
+                self._deliver(messages)
+            for item in items:
+                if isinstance(item, Event):
+                    item.set()
+            if self._STOP in items:
+                return
+
+    def _deliver(self, messages: List[str]):
+        log_batch(messages)
+        for observer in list(self.observers):
+            try:
+                observer.update_batch(messages)
+            except Exception:  # сбой одного наблюдателя не должен останавливать доставку
+                logging.exception("Observer %r failed", observer)
+        self.delivered += len(messages)
+        self.batches += 1
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        if not self._thread.is_alive():
+            return True
+        done = Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(self._STOP)
+            self._thread.join()
+        atexit.unregister(self.close)
+
 # ==================== СУЩНОСТИ ====================
 class BookStatus(Enum):
     AVAILABLE = "available"
     BORROWED = "borrowed"
 
-@dataclass
+# slots=True: без __dict__ у каждого экземпляра — заметно меньше памяти на запись
+@dataclass(slots=True)
 class Book:
     id: int
     title: str
@@ -53,8 +155,9 @@ class Book:
     isbn: str
     status: BookStatus = BookStatus.AVAILABLE
     borrower_id: Optional[int] = None
+    borrowed_at: Optional[float] = None  # время выдачи (time.time())
 
-@dataclass
+@dataclass(slots=True)
 class Librarian:
     id: int
     name: str
@@ -62,7 +165,7 @@ class Librarian:
     phone: str
     position: str
 
-@dataclass
+@dataclass(slots=True)
 class Reader:
     id: int
     name: str
@@ -70,6 +173,352 @@ class Reader:
     phone: str
     books_borrowed: List[int]
 
+ENTITY_TYPES = {'books': Book, 'librarians': Librarian, 'readers': Reader}
+
+def entity_to_dict(entity) -> Dict[str, Any]:
+    data = asdict(entity)
+    if isinstance(entity, Book):
+        data['status'] = entity.status.value
+    return data
+
+def entity_from_dict(kind: str, data: Dict[str, Any]):
+    entity = ENTITY_TYPES[kind](**data)
+    if kind == 'books':
+        entity.status = BookStatus(entity.status)
+    return entity
+
+# ==================== ПОТОКОВОЕ ЧТЕНИЕ СОСТОЯНИЯ ====================
+@contextmanager
+def gc_paused():
+    """Отключает сборщик мусора на время массового создания объектов:
+    иначе он многократно обходит все уже загруженные сущности."""
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+class StateReader:
+    """Потоковый разбор файла состояния ``{"books": [...], ...}``.
+
+    Файл читается кусками по ``chunk_size`` символов, итерация выдаёт пары
+    (ключ, элемент) для элементов списков верхнего уровня — весь документ
+    в памяти не держится. Скалярные значения верхнего уровня (например,
+    ``journal_seq``) собираются в ``scalars`` по мере чтения.
+    """
+
+    _WHITESPACE = re.compile(r"[ \t\n\r]*")
+    _SEPARATOR = re.compile(r"[ \t\n\r]*([,\]])[ \t\n\r]*")
+    # До конца буфера только символы, которыми может продолжаться число
+    _NUMBER_TAIL = re.compile(r"[0-9.eE+\-]*\Z")
+
+    def __init__(self, f, chunk_size: int = 1 << 20):
+        self._file = f
+        self._chunk_size = chunk_size
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+        self._decoder = json.JSONDecoder()
+        self.scalars: Dict[str, Any] = {}
+
+    def _fill(self) -> bool:
+        if self._eof:
+            return False
+        chunk = self._file.read(self._chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def _peek(self) -> str:
+        while True:
+            self._pos = self._WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer) or not self._fill():
+                return self._buffer[self._pos:self._pos + 1]
+
+    def _expect(self, char: str):
+        if self._peek() != char:
+            raise ValueError(f"Invalid state file: expected {char!r}")
+        self._pos += 1
+
+    def _value(self):
+        while True:
+            self._peek()
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # Значение у конца куска могло оборваться: число «0.5» на границе
+            # после «0.» разбирается как 0, поэтому дочитываем и в этом случае
+            if self._NUMBER_TAIL.match(self._buffer, end) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+    def __iter__(self):
+        self._expect('{')
+        if self._peek() == '}':
+            return
+        while True:
+            key = self._value()
+            self._expect(':')
+            if self._peek() == '[':
+                self._pos += 1
+                if self._peek() == ']':
+                    self._pos += 1
+                else:
+                    for item in self._items():
+                        yield key, item
+            else:
+                self.scalars[key] = self._value()
+            if self._peek() == '}':
+                return
+            self._expect(',')
+
+    def _items(self):
+        """Элементы текущего списка до закрывающей ``]`` включительно."""
+        decode = self._decoder.raw_decode
+        separator = self._SEPARATOR
+        while True:
+            buffer, pos = self._buffer, self._pos
+            try:
+                item, end = decode(buffer, pos)
+                match = separator.match(buffer, end)
+            except json.JSONDecodeError:
+                match = None
+            if match is not None and match.end() < len(buffer):
+                closing = match.group(1)
+                self._pos = match.end()
+            else:  # элемент или разделитель на границе куска — дочитываем
+                item = self._value()
+                closing = self._peek()
+                if closing not in (',', ']'):
+                    raise ValueError("Invalid state file: expected ',' or ']'")
+                self._pos += 1
+                self._peek()
+            yield item
+            if closing == ']':
+                return
+
+# ==================== СИНХРОНИЗАЦИЯ ====================
+def synchronized(method):
+    """Выполняет метод под ``self._lock`` (RLock или nullcontext без блокировки)."""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+class StripedLock:
+    """Блокировки по сущностям: ключ (вид, id) отображается на одну из ``stripes``
+    блокировок. Несколько ключей захватываются в порядке номеров полос, поэтому
+    взаимоблокировок нет, а операции над разными сущностями не ждут друг друга.
+    """
+
+    def __init__(self, stripes: int = 64):
+        self._locks = [RLock() for _ in range(stripes)]
+
+    @contextmanager
+    def hold(self, *keys):
+        stripes = sorted({hash(key) % len(self._locks) for key in keys})
+        for stripe in stripes:
+            self._locks[stripe].acquire()
+        try:
+            yield
+        finally:
+            for stripe in reversed(stripes):
+                self._locks[stripe].release()
+
+    @contextmanager
+    def hold_all(self):
+        """Все полосы сразу (в том же порядке номеров, что и ``hold``)."""
+        for lock in self._locks:
+            lock.acquire()
+        try:
+            yield
+        finally:
+            for lock in reversed(self._locks):
+                lock.release()
+
+# ==================== ПАТТЕРН: SPECIFICATION (запросы) ====================
+class Predicate(ABC):
+    """Условие на одно поле сущности."""
+    field: str
+    point_lookup = False  # кандидаты берутся из хэш-индекса без обхода его ключей
+
+    @abstractmethod
+    def matches(self, value) -> bool: ...
+
+    def index_keys(self, index: Dict[Any, Any]) -> Iterable:
+        """Ключи хэш-индекса поля, удовлетворяющие условию."""
+        return [key for key in index if self.matches(key)]
+
+    @abstractmethod
+    def to_sql(self, convert) -> Optional[Tuple[str, List[Any]]]:
+        """Условие WHERE и параметры; convert(field, value) — значение для БД.
+        None — условие не переводится в SQL и проверяется в Python."""
+
+def _sql_value(value) -> bool:
+    return isinstance(value, (int, float, str))
+
+def _plain(value):
+    """Значение перечисления сравнивается по value — как в БД и при сортировке."""
+    return value.value if isinstance(value, Enum) else value
+
+def _enum_keyed(index: Dict[Any, Any]) -> bool:
+    """Ключи индекса — перечисления: их мало, и искать среди них надо по value."""
+    return isinstance(next(iter(index), None), Enum)
+
+@dataclass(frozen=True)
+class Eq(Predicate):
+    field: str
+    value: Any
+    point_lookup = True
+
+    def matches(self, value): return _plain(value) == _plain(self.value)
+
+    def index_keys(self, index):
+        try:
+            if self.value in index:
+                return [self.value]
+        except TypeError:  # нехэшируемое значение
+            return [key for key in index if self.matches(key)]
+        return [key for key in index if self.matches(key)] if _enum_keyed(index) else []
+
+    def to_sql(self, convert):
+        if self.value is None:
+            return f"{self.field} IS NULL", []
+        value = convert(self.field, self.value)
+        return (f"{self.field} = ?", [value]) if _sql_value(value) else None
+
+@dataclass(frozen=True)
+class Range(Predicate):
+    """low <= значение <= high; отсутствующая граница не проверяется."""
+    field: str
+    low: Any = None
+    high: Any = None
+
+    def matches(self, value):
+        value = _plain(value)
+        return value is not None and (self.low is None or value >= _plain(self.low)) and \
+            (self.high is None or value <= _plain(self.high))
+
+    def to_sql(self, convert):
+        where, params = [], []
+        for op, bound in ((">=", self.low), ("<=", self.high)):
+            if bound is not None:
+                bound = convert(self.field, bound)
+                if not _sql_value(bound):
+                    return None
+                where.append(f"{self.field} {op} ?")
+                params.append(bound)
+        return " AND ".join(where) or f"{self.field} IS NOT NULL", params
+
+@dataclass(frozen=True)
+class In(Predicate):
+    field: str
+    values: Tuple[Any, ...]
+    point_lookup = True
+
+    def __post_init__(self):
+        object.__setattr__(self, 'values', tuple(self.values))
+        object.__setattr__(self, '_plain_values', tuple(_plain(v) for v in self.values))
+
+    def matches(self, value): return _plain(value) in self._plain_values
+
+    def index_keys(self, index):
+        if _enum_keyed(index):
+            return [key for key in index if self.matches(key)]
+        try:
+            return [v for v in set(self.values) if v in index]
+        except TypeError:
+            return [key for key in index if self.matches(key)]
+
+    def to_sql(self, convert):
+        values = [convert(self.field, v) for v in self.values]
+        if not all(_sql_value(v) for v in values):
+            return None
+        return f"{self.field} IN ({', '.join('?' * len(values))})" if values else "0", values
+
+@dataclass(frozen=True)
+class Prefix(Predicate):
+    field: str
+    prefix: str
+
+    def matches(self, value):
+        value = _plain(value)
+        return isinstance(value, str) and value.startswith(self.prefix)
+
+    def to_sql(self, convert):
+        # Диапазон [prefix, следующая строка) использует индекс, в отличие от LIKE,
+        # и чувствителен к регистру, как str.startswith
+        if not self.prefix or self.prefix[-1] == chr(sys.maxunicode):
+            return f"substr({self.field}, 1, ?) = ?", [len(self.prefix), self.prefix]
+        following = ord(self.prefix[-1]) + 1
+        if 0xD800 <= following <= 0xDFFF:  # суррогаты не кодируются в UTF-8
+            following = 0xE000
+        upper = self.prefix[:-1] + chr(following)
+        return f"{self.field} >= ? AND {self.field} < ?", [self.prefix, upper]
+
+@dataclass(frozen=True, init=False)
+class Query:
+    """Запрос: условия (AND), сортировка и ограничение числа результатов.
+
+    Строится цепочкой: ``Query(Eq('author', 'X')).where(Range('year', 1990, 2000))
+    .order_by('year').limit(50)``; каждый шаг возвращает новый запрос.
+    None при сортировке идут в конце, равные значения — в порядке id.
+    """
+    predicates: Tuple[Predicate, ...] = ()
+    order: Optional[str] = None
+    descending: bool = False
+    count: Optional[int] = None
+
+    def __init__(self, *predicates: Predicate, order: Optional[str] = None,
+                 descending: bool = False, count: Optional[int] = None):
+        object.__setattr__(self, 'predicates', predicates)
+        object.__setattr__(self, 'order', order)
+        object.__setattr__(self, 'descending', descending)
+        object.__setattr__(self, 'count', count)
+
+    def where(self, *predicates: Predicate) -> 'Query':
+        return Query(*self.predicates, *predicates, order=self.order,
+                     descending=self.descending, count=self.count)
+
+    def order_by(self, field_name: str, descending: bool = False) -> 'Query':
+        return Query(*self.predicates, order=field_name, descending=descending, count=self.count)
+
+    def limit(self, count: int) -> 'Query':
+        return Query(*self.predicates, order=self.order, descending=self.descending, count=count)
+
+    def matches(self, entity) -> bool:
+        return entity is not None and all(p.matches(getattr(entity, p.field, None)) for p in self.predicates)
+
+    def _sort_key(self):
+        name, missing, present = self.order, (0,) if self.descending else (1,), 1 if self.descending else 0
+        def key(entity):
+            value = getattr(entity, name, None)
+            if value is None:
+                return missing
+            return present, _plain(value)
+        return key
+
+    def execute(self, entities: Iterable) -> List:
+        """Фильтрует сущности (в порядке id), сортирует и обрезает; при
+        limit и order_by — выбор top-k через кучу вместо полной сортировки."""
+        matched = filter(self.matches, entities)
+        if self.order is None:
+            return list(islice(matched, self.count))
+        if self.count is None:
+            return sorted(matched, key=self._sort_key(), reverse=self.descending)
+        select = heapq.nlargest if self.descending else heapq.nsmallest
+        return select(self.count, matched, key=self._sort_key())
+
 # ==================== ПАТТЕРН: REPOSITORY ====================
 class Repository(ABC):
     @abstractmethod
@@ -84,203 +533,1673 @@ class Repository(ABC):
     def delete(self, entity_id): ...
     @abstractmethod
     def search(self, **kwargs): ...
+    @abstractmethod
+    def clear(self): ...
+    @abstractmethod
+    def put(self, entity): ...
+
+    def bulk_add(self, entities):
+        """Добавление многих новых сущностей (id назначаются по порядку)."""
+        for entity in entities:
+            self.add(entity)
 
-class BookRepository(Repository):
-    def __init__(self):
-        self.books: Dict[int, Book] = {}
+    def bulk_load(self, entities) -> int:
+        """Загрузка сущностей с их собственными id; возвращает их число."""
+        count = 0
+        for entity in entities:
+            self.put(entity)
+            count += 1
+        return count
+
+    def iter_search(self, limit: Optional[int] = None, offset: int = 0,
+                    after_id: Optional[int] = None, **kwargs):
+        """Результаты ``search`` по одной сущности в порядке id. Страницы —
+        через limit/offset или курсор after_id (id последней полученной сущности)."""
+        results = (e for e in self.search(**kwargs) if after_id is None or e.id > after_id)
+        return islice(results, offset, None if limit is None else offset + limit)
+
+    def query(self, query: Query) -> List:
+        return query.execute(self.get_all())
+
+def matches_criteria(entity, criteria: Dict[str, Any]) -> bool:
+    return entity is not None and all(getattr(entity, k, None) == v for k, v in criteria.items())
+
+class InMemoryRepository(Repository):
+    """Хранилище сущностей в словаре id -> сущность со вторичными индексами.
+
+    Для полей из ``indexed_fields`` поддерживаются хэш-индексы
+    значение -> множество id. ``add``/``update``/``delete`` обновляют их,
+    а ``search`` пересекает множества кандидатов (начиная с самого
+    маленького) и лишь оставшиеся условия проверяет перебором. Изменённую
+    на месте сущность нужно передать в ``update``, чтобы индексы
+    обновились — как это и делает фасад.
+    """
+
+    indexed_fields: Tuple[str, ...] = ()
+
+    def __init__(self, lock: Optional[RLock] = None):
+        # lock защищает сущности и индексы при работе из нескольких потоков
+        self._lock = lock or nullcontext()
+        self._entities: Dict[int, Any] = {}
         self.next_id = 1
-    def add(self, book: Book):
-        book.id = self.next_id
-        self.books[self.next_id] = book
+        # значение -> id (если сущность одна) или множество id
+        self._indexes: Dict[str, Dict[Any, Union[int, Set[int]]]] = {f: {} for f in self.indexed_fields}
+        # Проиндексированные значения по id: сущность могли изменить на месте до update()
+        self._indexed_values: Dict[int, Tuple] = {}
+
+    # ----------------- индексы -----------------
+    def _index(self, entity):
+        values = tuple(getattr(entity, f, None) for f in self.indexed_fields)
+        for field, value in zip(self.indexed_fields, values):
+            index = self._indexes[field]
+            ids = index.get(value)
+            if ids is None:
+                index[value] = entity.id  # уникальные значения (isbn, email) хранятся без set
+            elif isinstance(ids, int):
+                index[value] = {ids, entity.id}
+            else:
+                ids.add(entity.id)
+        self._remember_indexed(entity.id, values)
+
+    def _remember_indexed(self, entity_id, values):
+        self._indexed_values[entity_id] = values
+
+    def _forget_indexed(self, entity_id) -> Optional[Tuple]:
+        return self._indexed_values.pop(entity_id, None)
+
+    def _unindex(self, entity_id):
+        values = self._forget_indexed(entity_id)
+        if values is None:
+            return
+        for field, value in zip(self.indexed_fields, values):
+            index = self._indexes[field]
+            ids = index.get(value)
+            if ids == entity_id:
+                del index[value]
+            elif isinstance(ids, set):
+                ids.discard(entity_id)
+                if len(ids) == 1:
+                    index[value] = ids.pop()
+
+    # ----------------- CRUD -----------------
+    @synchronized
+    def add(self, entity):
+        entity.id = self.next_id
+        self._entities[self.next_id] = entity
+        self._index(entity)
         self.next_id += 1
-    def get(self, entity_id): return self.books.get(entity_id)
-    def get_all(self): return list(self.books.values())
-    def update(self, book: Book):
-        if book.id in self.books: self.books[book.id] = book
+    def get(self, entity_id): return self._entities.get(entity_id)
+    @synchronized
+    def get_all(self): return list(self._entities.values())
+    @synchronized
+    def update(self, entity):
+        if entity.id in self._entities:
+            self._unindex(entity.id)
+            self._entities[entity.id] = entity
+            self._index(entity)
+    @synchronized
     def delete(self, entity_id):
-        if entity_id in self.books: del self.books[entity_id]
+        if entity_id in self._entities:
+            self._unindex(entity_id)
+            del self._entities[entity_id]
+    @synchronized
+    def clear(self):
+        self.__init__(self._lock)  # пустое хранилище и индексы, как у нового репозитория
+    @synchronized
+    def put(self, entity):
+        """Вставка или замена сущности с её собственным id (восстановление из журнала)."""
+        if entity.id in self._entities:
+            self._unindex(entity.id)
+        self._entities[entity.id] = entity
+        self._index(entity)
+        self.next_id = max(self.next_id, entity.id + 1)
+
+    @synchronized
+    def bulk_load(self, entities) -> int:
+        """Вставка с сохранёнными id без обновления индексов на каждую
+        сущность: индексы строятся заново одним проходом в конце."""
+        stored = self._entities
+        count = 0
+        for entity in entities:
+            stored[entity.id] = entity
+            count += 1
+        self._rebuild_indexes()
+        if stored:
+            self.next_id = max(self.next_id, max(stored) + 1)
+        return count
+
+    def _rebuild_indexes(self):
+        entities = self.get_all()
+        ids = [e.id for e in entities]
+        columns = [[getattr(e, f, None) for e in entities] for f in self.indexed_fields]
+        self._build_indexes(ids, columns)
+        self._indexed_values = dict(zip(ids, zip(*columns)))
+
+    def _build_indexes(self, ids: List[int], columns: List[List[Any]]):
+        """Индексы по колонкам значений: columns[i][j] — поле i сущности ids[j]."""
+        self._indexes = {}
+        for field, values in zip(self.indexed_fields, columns):
+            index: Dict[Any, Union[int, Set[int]]] = {}
+            for entity_id, value in zip(ids, values):
+                bucket = index.get(value)
+                if bucket is None:
+                    index[value] = entity_id
+                elif isinstance(bucket, int):
+                    index[value] = {bucket, entity_id}
+                else:
+                    bucket.add(entity_id)
+            self._indexes[field] = index
+
+    def __len__(self): return len(self._entities)
+
+    def _sorted_ids(self, after: int) -> List[int]:
+        """Сохранённые id больше after по возрастанию."""
+        return sorted(i for i in self._entities if i > after)
+
+    def _candidates(self, criteria: Dict[str, Any]) -> Tuple[Optional[Set[int]], Dict[str, Any]]:
+        """id, подходящие по индексам (None — индексы не помогли), и условия,
+        которые остаётся проверить перебором."""
+        candidates: List[Any] = []
+        rest = {}
+        for key, value in criteria.items():
+            index = self._indexes.get(key)
+            try:
+                ids = index.get(value) if index is not None else None
+            except TypeError:  # нехэшируемое значение — проверим перебором
+                index = None
+            if index is None:
+                rest[key] = value
+            elif ids is None:
+                return set(), {}
+            else:
+                candidates.append((ids,) if isinstance(ids, int) else ids)
+        if not candidates:
+            return None, rest
+        candidates.sort(key=len)
+        return set(candidates[0]).intersection(*candidates[1:]), rest
+
+    @synchronized
     def search(self, **kwargs):
-        results = self.get_all()
-        for key, value in kwargs.items():
-            if value is not None:
-                results = [b for b in results if getattr(b, key, None) == value]
+        ids, rest = self._candidates({k: v for k, v in kwargs.items() if v is not None})
+        results = self.get_all() if ids is None else [self.get(i) for i in sorted(ids)]
+        for key, value in rest.items():
+            results = [e for e in results if getattr(e, key, None) == value]
         return results
 
-class LibrarianRepository(Repository):
-    def __init__(self):
-        self.librarians: Dict[int, Librarian] = {}
-        self.next_id = 1
-    def add(self, librarian: Librarian):
-        librarian.id = self.next_id
-        self.librarians[self.next_id] = librarian
+    def iter_search(self, limit: Optional[int] = None, offset: int = 0,
+                    after_id: Optional[int] = None, **kwargs):
+        """Как ``search``, но сущности выдаются по одной, без общего списка.
+
+        Без подходящих индексов перебираются сохранённые id по возрастанию
+        (а не весь диапазон до next_id — id после удалений бывают редкими),
+        с индексами — только отсортированные id кандидатов. Каждая сущность
+        перепроверяется по всем условиям: её могли изменить, пока читатель
+        обрабатывал предыдущие.
+        """
+        criteria = {k: v for k, v in kwargs.items() if v is not None}
+        start = 0 if after_id is None else after_id
+        with self._lock:
+            ids, _ = self._candidates(criteria)
+            ids = self._sorted_ids(start) if ids is None else sorted(i for i in ids if i > start)
+        results = (e for e in map(self.get, ids) if matches_criteria(e, criteria))
+        return islice(results, offset, None if limit is None else offset + limit)
+
+    # Обход всех ключей индекса для Range/Prefix окупается, только если
+    # различных значений заметно меньше, чем сущностей (год, автор, статус)
+    scan_index_ratio = 8
+
+    def _plan(self, query: Query) -> Optional[List[int]]:
+        """Планировщик: отсортированные id кандидатов по самому избирательному
+        индексу или None, если выгоднее перебрать все сущности."""
+        total = len(self)
+        best: Optional[Tuple[int, Predicate, List[Any]]] = None
+        for predicate in sorted(query.predicates, key=lambda p: not p.point_lookup):
+            index = self._indexes.get(predicate.field)
+            if index is None:
+                continue
+            if not predicate.point_lookup and len(index) * self.scan_index_ratio > total:
+                continue
+            keys = predicate.index_keys(index)
+            size = sum(1 if isinstance(index[k], int) else len(index[k]) for k in keys)
+            if best is None or size < best[0]:
+                best = (size, predicate, keys)
+            if size == 0:
+                break
+        if best is None:
+            return None
+        index = self._indexes[best[1].field]
+        ids: List[int] = []
+        for key in best[2]:
+            bucket = index[key]
+            if isinstance(bucket, int):
+                ids.append(bucket)
+            else:
+                ids.extend(bucket)
+        ids.sort()
+        return ids
+
+    def query(self, query: Query) -> List:
+        with self._lock:
+            ids = self._plan(query)
+            entities = self.get_all() if ids is None else [self.get(i) for i in ids]
+        # Условия перепроверяются для всех кандидатов — индекс отбирает лишь по одному
+        return query.execute(entities)
+
+class BookRepository(InMemoryRepository):
+    indexed_fields = ("isbn", "author", "year", "status")
+    @property
+    def books(self) -> Dict[int, Book]: return self._entities
+
+class ColumnarBookRepository(BookRepository):
+    """Колоночное хранилище книг для очень больших каталогов.
+
+    Книга с id хранится в строке id - 1 набора колонок: года — в
+    ``array('i')``, статус — байтом, id читателя — в ``array('q')``
+    (-1 вместо None), время выдачи — в ``array('d')`` (NaN вместо None),
+    строки авторов интернируются. ``get`` собирает
+    новый объект ``Book``: изменения в нём попадают в хранилище только
+    через ``update`` (фасад так и работает).
+    """
+
+    _STATUS_CODES = {status: code for code, status in enumerate(BookStatus)}
+    _STATUSES = list(BookStatus)
+    _DELETED = 255
+
+    def __init__(self, lock: Optional[RLock] = None):
+        super().__init__(lock)
+        self._titles: List[Optional[str]] = []
+        self._authors: List[Optional[str]] = []
+        self._years = array('i')
+        self._isbns: List[Optional[str]] = []
+        self._statuses = bytearray()
+        self._borrowers = array('q')
+        self._borrowed_at = array('d')
+        self._count = 0
+
+    @property
+    def books(self) -> Dict[int, Book]:
+        """Материализованная копия id -> книга (только для чтения)."""
+        return {b.id: b for b in self.get_all()}
+
+    def __len__(self): return self._count
+
+    def _sorted_ids(self, after: int) -> List[int]:
+        # Строка = id - 1, так что порядок строк — уже порядок id
+        deleted = self._DELETED
+        return [row + 1 for row, status in enumerate(self._statuses[max(after, 0):], max(after, 0))
+                if status != deleted]
+
+    def _row(self, entity_id) -> Optional[int]:
+        row = entity_id - 1 if isinstance(entity_id, int) else -1
+        if 0 <= row < len(self._statuses) and self._statuses[row] != self._DELETED:
+            return row
+        return None
+
+    def _book(self, row) -> Book:
+        borrower = self._borrowers[row]
+        borrowed_at = self._borrowed_at[row]
+        return Book(row + 1, self._titles[row], self._authors[row], self._years[row], self._isbns[row],
+                    self._STATUSES[self._statuses[row]], None if borrower < 0 else borrower,
+                    None if math.isnan(borrowed_at) else borrowed_at)
+
+    def _store(self, book: Book):
+        row = book.id - 1
+        missing = row + 1 - len(self._statuses)
+        if missing > 0:  # пропуски в id (после загрузки) заполняются удалёнными строками
+            self._titles.extend([None] * missing)
+            self._authors.extend([None] * missing)
+            self._years.extend([0] * missing)
+            self._isbns.extend([None] * missing)
+            self._statuses.extend([self._DELETED] * missing)
+            self._borrowers.extend([-1] * missing)
+            self._borrowed_at.extend([math.nan] * missing)
+        self._titles[row] = book.title
+        self._authors[row] = sys.intern(book.author)
+        self._years[row] = book.year
+        self._isbns[row] = book.isbn
+        self._statuses[row] = self._STATUS_CODES[book.status]
+        self._borrowers[row] = -1 if book.borrower_id is None else book.borrower_id
+        self._borrowed_at[row] = math.nan if book.borrowed_at is None else book.borrowed_at
+
+    # Старые значения для индексов читаются прямо из колонок
+    def _remember_indexed(self, entity_id, values): pass
+    def _forget_indexed(self, entity_id):
+        row = self._row(entity_id)
+        return None if row is None else \
+            tuple(getattr(self._book(row), f) for f in self.indexed_fields)
+
+    @synchronized
+    def add(self, book: Book):
+        book.id = self.next_id
+        self._store(book)
+        self._index(book)
+        self._count += 1
         self.next_id += 1
-    def get(self, entity_id): return self.librarians.get(entity_id)
-    def get_all(self): return list(self.librarians.values())
-    def update(self, librarian: Librarian):
-        if librarian.id in self.librarians: self.librarians[librarian.id] = librarian
+    @synchronized
+    def get(self, entity_id):
+        row = self._row(entity_id)
+        return None if row is None else self._book(row)
+    @synchronized
+    def get_all(self):
+        deleted = self._DELETED
+        return [self._book(row) for row, status in enumerate(self._statuses) if status != deleted]
+    @synchronized
+    def update(self, book: Book):
+        if self._row(book.id) is not None:
+            self._unindex(book.id)
+            self._store(book)
+            self._index(book)
+    @synchronized
     def delete(self, entity_id):
-        if entity_id in self.librarians: del self.librarians[entity_id]
-    def search(self, **kwargs):
-        results = self.get_all()
-        for key, value in kwargs.items():
-            if value is not None:
-                results = [l for l in results if getattr(l, key, None) == value]
-        return results
+        row = self._row(entity_id)
+        if row is not None:
+            self._unindex(entity_id)
+            self._titles[row] = self._authors[row] = self._isbns[row] = None
+            self._statuses[row] = self._DELETED
+            self._count -= 1
+    @synchronized
+    def put(self, book: Book):
+        if self._row(book.id) is not None:
+            self._unindex(book.id)
+        else:
+            self._count += 1
+        self._store(book)
+        self._index(book)
+        self.next_id = max(self.next_id, book.id + 1)
+    @synchronized
+    def bulk_load(self, books) -> int:
+        count = 0
+        for book in books:
+            self._store(book)
+            count += 1
+        self._count = len(self._statuses) - self._statuses.count(self._DELETED)
+        self._rebuild_indexes()
+        self.next_id = max(self.next_id, len(self._statuses) + 1)
+        return count
+    def _rebuild_indexes(self):
+        deleted = self._DELETED
+        rows = [row for row, status in enumerate(self._statuses) if status != deleted]
+        columns = {
+            'isbn': [self._isbns[row] for row in rows],
+            'author': [self._authors[row] for row in rows],
+            'year': [self._years[row] for row in rows],
+            'status': [self._STATUSES[self._statuses[row]] for row in rows],
+        }
+        self._build_indexes([row + 1 for row in rows], [columns[f] for f in self.indexed_fields])
+
+class LibrarianRepository(InMemoryRepository):
+    indexed_fields = ("email", "name")
+    @property
+    def librarians(self) -> Dict[int, Librarian]: return self._entities
+
+class ReaderRepository(InMemoryRepository):
+    indexed_fields = ("email", "name")
+    @property
+    def readers(self) -> Dict[int, Reader]: return self._entities
+
+# ==================== SQLITE-РЕПОЗИТОРИИ ====================
+@contextmanager
+def sqlite_transaction(connection: sqlite3.Connection, lock: RLock):
+    with lock:
+        if connection.in_transaction:
+            yield
+            return
+        connection.execute("BEGIN")
+        try:
+            yield
+            connection.execute("COMMIT")
+        except BaseException:
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            raise
+
+class SQLiteRepository(Repository):
+    """Репозиторий поверх таблицы SQLite (локальный файл, без сервера).
+
+    SQL-тексты собираются один раз в конструкторе, так что повторные
+    запросы берутся из кэша подготовленных выражений sqlite3. Для полей
+    ``indexed_fields`` создаются индексы, ``search`` переводит условия на
+    известные колонки в WHERE. ``bulk_add`` и ``transaction()`` объединяют
+    много изменений в одну транзакцию. id новых записей назначает сама
+    SQLite (AUTOINCREMENT): удалённые id не переиспользуются, а два
+    соединения, пишущие в один файл, не получат одинаковый id.
+    """
+
+    table = ""
+    entity_cls: Any = None
+    columns: Tuple[Tuple[str, str], ...] = ()  # (имя, тип) без id
+    indexed_fields: Tuple[str, ...] = ()
+
+    def __init__(self, connection: sqlite3.Connection, lock: Optional[RLock] = None):
+        self._conn = connection
+        self._lock = lock or RLock()
+        self._names = [name for name, _ in self.columns]
+        names = ", ".join(self._names)
+        self._select_sql = f"SELECT id, {names} FROM {self.table}"
+        self._insert_sql = (f"INSERT INTO {self.table} (id, {names}) "
+                            f"VALUES ({', '.join('?' * (len(self._names) + 1))})")
+        self._add_sql = (f"INSERT INTO {self.table} ({names}) "
+                         f"VALUES ({', '.join('?' * len(self._names))})")
+        self._update_sql = (f"UPDATE {self.table} SET {', '.join(n + ' = ?' for n in self._names)} "
+                            f"WHERE id = ?")
+        self._put_sql = self._insert_sql.replace("INSERT", "INSERT OR REPLACE", 1)
+        with self._lock:
+            columns = ", ".join(f"{name} {kind}" for name, kind in self.columns)
+            self._conn.execute(f"CREATE TABLE IF NOT EXISTS {self.table} "
+                               f"(id INTEGER PRIMARY KEY AUTOINCREMENT, {columns})")
+            self._create_indexes()
+
+    def _create_indexes(self):
+        for field in self.indexed_fields:
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{self.table}_{field} "
+                               f"ON {self.table} ({field})")
+
+    def _drop_indexes(self):
+        for field in self.indexed_fields:
+            self._conn.execute(f"DROP INDEX IF EXISTS idx_{self.table}_{field}")
+
+    # ----------------- преобразование строк -----------------
+    def _to_db(self, field, value):
+        return value
+
+    def _from_db(self, field, value):
+        return value
+
+    def _to_row(self, entity) -> tuple:
+        return tuple(self._to_db(n, getattr(entity, n)) for n in self._names)
+
+    def _from_row(self, row):
+        return self.entity_cls(row[0], *(self._from_db(n, v) for n, v in zip(self._names, row[1:])))
+
+    # ----------------- транзакции -----------------
+    def transaction(self):
+        """Все изменения внутри блока — одна транзакция (вложенные блоки сливаются)."""
+        return sqlite_transaction(self._conn, self._lock)
+
+    @property
+    def next_id(self) -> int:
+        """id, который получит следующая запись (только для чтения: его ведёт SQLite)."""
+        with self._lock:
+            return self._conn.execute(
+                f"SELECT MAX(COALESCE((SELECT seq FROM sqlite_sequence WHERE name = ?), 0), "
+                f"COALESCE((SELECT MAX(id) FROM {self.table}), 0)) + 1", (self.table,)).fetchone()[0]
+
+    # ----------------- CRUD -----------------
+    def add(self, entity):
+        with self.transaction():
+            entity.id = self._conn.execute(self._add_sql, self._to_row(entity)).lastrowid
+
+    def bulk_add(self, entities):
+        """Пакетная вставка одной транзакцией: id первой записи назначает
+        SQLite, остальные идут за ним подряд и вставляются через executemany
+        (после первой вставки транзакция держит блокировку записи, так что
+        другие соединения вклиниться не могут)."""
+        entities = list(entities)
+        if not entities:
+            return
+        with self.transaction():
+            self.add(entities[0])
+            first = entities[0].id
+            for offset, entity in enumerate(entities[1:], 1):
+                entity.id = first + offset
+            self._conn.executemany(self._insert_sql, ((e.id, *self._to_row(e)) for e in entities[1:]))
+
+    def get(self, entity_id):
+        with self._lock:
+            row = self._conn.execute(self._select_sql + " WHERE id = ?", (entity_id,)).fetchone()
+        return None if row is None else self._from_row(row)
+
+    def get_all(self):
+        with self._lock:
+            rows = self._conn.execute(self._select_sql + " ORDER BY id").fetchall()
+        return [self._from_row(r) for r in rows]
+
+    def update(self, entity):
+        with self.transaction():
+            self._conn.execute(self._update_sql, (*self._to_row(entity), entity.id))
 
-class ReaderRepository(Repository):
-    def __init__(self):
-        self.readers: Dict[int, Reader] = {}
-        self.next_id = 1
-    def add(self, reader: Reader):
-        reader.id = self.next_id
-        self.readers[self.next_id] = reader
-        self.next_id += 1
-    def get(self, entity_id): return self.readers.get(entity_id)
-    def get_all(self): return list(self.readers.values())
-    def update(self, reader: Reader):
-        if reader.id in self.readers: self.readers[reader.id] = reader
     def delete(self, entity_id):
-        if entity_id in self.readers: del self.readers[entity_id]
-    def search(self, **kwargs):
-        results = self.get_all()
+        with self.transaction():
+            self._conn.execute(f"DELETE FROM {self.table} WHERE id = ?", (entity_id,))
+
+    def clear(self):
+        with self.transaction():
+            self._conn.execute(f"DELETE FROM {self.table}")
+
+    def put(self, entity):
+        with self.transaction():
+            self._conn.execute(self._put_sql, (entity.id, *self._to_row(entity)))
+
+    def bulk_load(self, entities) -> int:
+        """Вставка с сохранёнными id одной транзакцией; индексы БД
+        удаляются на время загрузки и строятся заново в конце."""
+        count = 0
+        def rows():
+            nonlocal count
+            for entity in entities:
+                count += 1
+                yield (entity.id, *self._to_row(entity))
+        with self.transaction():
+            self._drop_indexes()
+            self._conn.executemany(self._put_sql, rows())
+            self._create_indexes()
+        return count
+
+    def _comparable(self, field, value) -> bool:
+        """Условие можно проверить в SQL с тем же результатом, что и ``==`` в
+        памяти: значение простое и переживает путь в БД и обратно без изменений
+        (строка 'borrowed' для поля-перечисления не равна BookStatus.BORROWED)."""
+        stored = self._to_db(field, value)
+        if not isinstance(stored, (int, str)):
+            return False
+        try:
+            return self._from_db(field, stored) == value
+        except ValueError:
+            return False
+
+    def _where(self, kwargs) -> Tuple[List[str], List[Any], Dict[str, Any]]:
+        """Условия для WHERE, их параметры и условия для проверки в Python."""
+        where, params, rest = [], [], {}
         for key, value in kwargs.items():
-            if value is not None:
-                results = [r for r in results if getattr(r, key, None) == value]
+            if value is None:
+                continue
+            if key == "id" or key in self._names and self._comparable(key, value):
+                where.append(f"{key} = ?")
+                params.append(self._to_db(key, value))
+            else:
+                rest[key] = value
+        return where, params, rest
+
+    def search(self, **kwargs):
+        where, params, rest = self._where(kwargs)
+        sql = self._select_sql + (" WHERE " + " AND ".join(where) if where else "") + " ORDER BY id"
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        results = [self._from_row(r) for r in rows]
+        for key, value in rest.items():
+            results = [e for e in results if getattr(e, key, None) == value]
         return results
 
+    def query(self, query: Query) -> List:
+        """Условия, сортировка и LIMIT переводятся в SQL; то, что перевести
+        нельзя, проверяется в Python над результатом."""
+        where, params, residual = [], [], False
+        for predicate in query.predicates:
+            translated = predicate.to_sql(self._to_db) \
+                if predicate.field == "id" or predicate.field in self._names else None
+            if translated is None:
+                residual = True
+            else:
+                where.append(translated[0])
+                params.extend(translated[1])
+        sql = self._select_sql + (" WHERE " + " AND ".join(f"({w})" for w in where) if where else "")
+        order = query.order
+        ordered = order is None or order == "id" or order in self._names
+        if order is not None and ordered:
+            # NULL в конце и равные значения по id — как в Query.execute
+            direction = " DESC" if query.descending else ""
+            sql += f" ORDER BY ({order} IS NULL), {order}{direction}, id"
+        else:
+            sql += " ORDER BY id"
+        exact = ordered and not residual
+        if exact and query.count is not None:
+            sql += " LIMIT ?"
+            params.append(query.count)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        entities = [self._from_row(r) for r in rows]
+        return entities if exact else query.execute(entities)
+
+    page_size = 1000
+
+    def iter_search(self, limit: Optional[int] = None, offset: int = 0,
+                    after_id: Optional[int] = None, **kwargs):
+        """Выборка страницами по ``page_size`` строк с курсором по id
+        (``id > последний``): блокировка соединения держится только на время
+        чтения страницы, а не всего обхода."""
+        where, params, rest = self._where(kwargs)
+        sql = (self._select_sql + " WHERE " + " AND ".join(where + ["id > ?"]) +
+               " ORDER BY id LIMIT ?")
+
+        def rows():
+            last = -1 if after_id is None else after_id
+            while True:
+                with self._lock:
+                    page = self._conn.execute(sql, (*params, last, self.page_size)).fetchall()
+                yield from page
+                if len(page) < self.page_size:
+                    return
+                last = page[-1][0]
+
+        results = (e for e in map(self._from_row, rows()) if matches_criteria(e, rest))
+        return islice(results, offset, None if limit is None else offset + limit)
+
+class SQLiteBookRepository(SQLiteRepository):
+    table = "books"
+    entity_cls = Book
+    columns = (("title", "TEXT"), ("author", "TEXT"), ("year", "INTEGER"), ("isbn", "TEXT"),
+               ("status", "TEXT"), ("borrower_id", "INTEGER"), ("borrowed_at", "REAL"))
+    indexed_fields = ("isbn", "author", "year", "status")
+
+    def _to_db(self, field, value):
+        return value.value if field == "status" and isinstance(value, BookStatus) else value
+
+    def _from_db(self, field, value):
+        return BookStatus(value) if field == "status" else value
+
+class SQLiteLibrarianRepository(SQLiteRepository):
+    table = "librarians"
+    entity_cls = Librarian
+    columns = (("name", "TEXT"), ("email", "TEXT"), ("phone", "TEXT"), ("position", "TEXT"))
+    indexed_fields = ("email", "name")
+
+class SQLiteReaderRepository(SQLiteRepository):
+    table = "readers"
+    entity_cls = Reader
+    columns = (("name", "TEXT"), ("email", "TEXT"), ("phone", "TEXT"), ("books_borrowed", "TEXT"))
+    indexed_fields = ("email", "name")
+
+    def _to_db(self, field, value):
+        return json.dumps(value) if field == "books_borrowed" else value
+
+    def _from_db(self, field, value):
+        return json.loads(value) if field == "books_borrowed" else value
+
+# ==================== ПАТТЕРН: STRATEGY (экспорт результатов поиска) ====================
+class SearchExporter(ABC):
+    """Запись результатов поиска в файл по мере их получения из iter_search."""
+
+    def export(self, entities: Iterable, path: str, kind: str) -> int:
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            return self.write(entities, f, kind)
+
+    @abstractmethod
+    def write(self, entities: Iterable, f, kind: str) -> int: ...
+
+class JsonLinesExporter(SearchExporter):
+    def write(self, entities, f, kind):
+        count = 0
+        for entity in entities:
+            f.write(json.dumps(entity_to_dict(entity), ensure_ascii=False) + '\n')
+            count += 1
+        return count
+
+class CsvExporter(SearchExporter):
+    """Столбцы — поля сущности; списки (books_borrowed) пишутся как JSON."""
+    def write(self, entities, f, kind):
+        writer = csv.DictWriter(f, fieldnames=[field.name for field in fields(ENTITY_TYPES[kind])])
+        writer.writeheader()
+        count = 0
+        for entity in entities:
+            data = entity_to_dict(entity)
+            writer.writerow({k: json.dumps(v) if isinstance(v, list) else v for k, v in data.items()})
+            count += 1
+        return count
+
+EXPORTERS = {'jsonl': JsonLinesExporter, 'csv': CsvExporter}
+
+# ==================== ПАТТЕРН: ABSTRACT FACTORY (хранилища) ====================
+class RepositoryFactory(ABC):
+    @abstractmethod
+    def create_books(self) -> Repository: ...
+    @abstractmethod
+    def create_librarians(self) -> Repository: ...
+    @abstractmethod
+    def create_readers(self) -> Repository: ...
+
+    @contextmanager
+    def replacing(self):
+        """Пустые репозитории (книги, библиотекари, читатели) для загрузки
+        состояния; фасад подменяет ими текущие, только если загрузка прошла
+        без ошибок."""
+        yield self.create_books(), self.create_librarians(), self.create_readers()
+
+    # transaction() открывает настоящую транзакцию (и держит блокировку соединения)
+    transactional = False
+
+    def transaction(self):
+        """Изменения во всех репозиториях внутри блока — одна единица
+        (для хранилищ с транзакциями; в памяти откатывает вызывающий)."""
+        return nullcontext()
+
+class InMemoryRepositoryFactory(RepositoryFactory):
+    def __init__(self, columnar_books: bool = False, thread_safe: bool = False):
+        # columnar_books: компактное колоночное хранилище для миллионов книг
+        self.columnar_books = columnar_books
+        # thread_safe: у каждого репозитория своя блокировка на индексы
+        self.thread_safe = thread_safe
+    def _lock(self): return RLock() if self.thread_safe else None
+    def create_books(self):
+        cls = ColumnarBookRepository if self.columnar_books else BookRepository
+        return cls(self._lock())
+    def create_librarians(self): return LibrarianRepository(self._lock())
+    def create_readers(self): return ReaderRepository(self._lock())
+
+class SQLiteRepositoryFactory(RepositoryFactory):
+    """Все три репозитория в одном файле БД с общим соединением.
+
+    WAL позволяет другим соединениям читать, пока идёт запись.
+    """
+    transactional = True
+
+    def __init__(self, path: str = "library.db"):
+        self.path = path
+        self.connection = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.lock = RLock()
+    def create_books(self): return SQLiteBookRepository(self.connection, self.lock)
+    def create_librarians(self): return SQLiteLibrarianRepository(self.connection, self.lock)
+    def create_readers(self): return SQLiteReaderRepository(self.connection, self.lock)
+    def close(self): self.connection.close()
+    def transaction(self): return sqlite_transaction(self.connection, self.lock)
+
+    @contextmanager
+    def replacing(self):
+        # Таблицы общие: очистка и загрузка — одна транзакция, при ошибке откатывается
+        repositories = (self.create_books(), self.create_librarians(), self.create_readers())
+        with self.transaction():
+            for repository in repositories:
+                repository.clear()
+            yield repositories
+
+# ==================== ПОЛНОТЕКСТОВЫЙ ИНДЕКС ====================
+class TextIndex:
+    """Инвертированный индекс: токен -> {id: частота}.
+
+    Текст приводится к casefold, «ё» заменяется на «е», токены — слова
+    (\\w+ в Unicode, так что кириллица разбирается корректно). Запрос из
+    нескольких слов работает как AND, в режиме ``prefix`` каждое слово
+    запроса ищется как префикс. Результаты ранжируются по TF-IDF.
+
+    С ``source`` индекс ленивый: строится из ``source()`` (документы
+    ``(doc_id, *texts)``) при первом поиске, а до того изменения не
+    отслеживает — они и так попадут в source.
+    """
+
+    _TOKEN = re.compile(r"\w+")
+
+    def __init__(self, lock: Optional[RLock] = None, source=None):
+        self._lock = lock or nullcontext()
+        self._source = source
+        self.invalidate()
+
+    @synchronized
+    def invalidate(self):
+        """Сбрасывает ленивый индекс: он построится заново при следующем поиске."""
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._doc_tokens: Dict[int, Counter] = {}
+        self._vocabulary: List[str] = []  # отсортированный словарь для префиксного поиска
+        self._built = self._source is None
+
+    def _ensure_built(self):
+        if not self._built:
+            with gc_paused():
+                self._bulk_add(self._source())
+            self._built = True
+
+    @classmethod
+    def tokenize(cls, text: str) -> List[str]:
+        return cls._TOKEN.findall(text.casefold().replace("ё", "е"))
+
+    @synchronized
+    def __len__(self):
+        self._ensure_built()
+        return len(self._doc_tokens)
+
+    @synchronized
+    def add(self, doc_id: int, *texts: str):
+        if not self._built:
+            return
+        self.remove(doc_id)
+        counts = Counter(t for text in texts if text for t in self.tokenize(text))
+        if not counts:
+            return
+        self._doc_tokens[doc_id] = counts
+        for token, tf in counts.items():
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = {}
+                bisect.insort(self._vocabulary, token)
+            postings[doc_id] = tf
+
+    @synchronized
+    def bulk_add(self, documents):
+        """Добавление многих документов ``(doc_id, *texts)`` разом: словарь
+        сортируется один раз в конце, а не вставкой на каждый новый токен."""
+        if self._built:
+            self._bulk_add(documents)
+
+    def _bulk_add(self, documents):
+        postings_by_token, doc_tokens = self._postings, self._doc_tokens
+        new_tokens: List[str] = []
+        removed = False
+        for doc_id, *texts in documents:
+            for token in doc_tokens.pop(doc_id, ()):
+                postings = postings_by_token[token]
+                del postings[doc_id]
+                if not postings:
+                    del postings_by_token[token]
+                    removed = True
+            counts = Counter(self.tokenize(" ".join(filter(None, texts))))
+            if not counts:
+                continue
+            doc_tokens[doc_id] = counts
+            for token, tf in counts.items():
+                postings = postings_by_token.get(token)
+                if postings is None:
+                    postings = postings_by_token[token] = {}
+                    new_tokens.append(token)
+                postings[doc_id] = tf
+        if removed:
+            self._vocabulary = sorted(postings_by_token)
+        elif new_tokens:
+            # Два отсортированных куска timsort сливает за линейное время
+            new_tokens.sort()
+            self._vocabulary += new_tokens
+            self._vocabulary.sort()
+
+    @synchronized
+    def remove(self, doc_id: int):
+        if not self._built:
+            return
+        counts = self._doc_tokens.pop(doc_id, None)
+        if not counts:
+            return
+        for token in counts:
+            postings = self._postings[token]
+            del postings[doc_id]
+            if not postings:
+                del self._postings[token]
+                del self._vocabulary[bisect.bisect_left(self._vocabulary, token)]
+
+    def _matches(self, term: str, prefix: bool) -> Dict[int, int]:
+        if not prefix:
+            return self._postings.get(term, {})
+        merged: Dict[int, int] = {}
+        i = bisect.bisect_left(self._vocabulary, term)
+        while i < len(self._vocabulary) and self._vocabulary[i].startswith(term):
+            for doc_id, tf in self._postings[self._vocabulary[i]].items():
+                merged[doc_id] = merged.get(doc_id, 0) + tf
+            i += 1
+        return merged
+
+    @synchronized
+    def search(self, query: str, prefix: bool = False, limit: Optional[int] = None) -> List[Tuple[int, float]]:
+        """Пары (id, релевантность) по убыванию релевантности."""
+        self._ensure_built()
+        terms = self.tokenize(query)
+        if not terms:
+            return []
+        matches = sorted((self._matches(t, prefix) for t in dict.fromkeys(terms)), key=len)
+        if not matches[0]:
+            return []
+        total_docs = len(self._doc_tokens)
+        scores: Dict[int, float] = {}
+        for doc_id in matches[0]:
+            if all(doc_id in m for m in matches[1:]):
+                scores[doc_id] = sum(m[doc_id] * math.log(1 + total_docs / len(m)) for m in matches)
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:limit] if limit is not None else ranked
+
+# ==================== ИНДЕКС ВЫДАЧ ====================
+@dataclass(frozen=True, slots=True)
+class Loan:
+    book_id: int
+    reader_id: int
+    borrowed_at: float
+
+class LoanIndex:
+    """Текущие выдачи: книга -> Loan, читатель -> множество книг и список
+    (borrowed_at, book_id), упорядоченный по времени выдачи.
+
+    Поиск выдачи по книге и книг читателя — O(1), просроченные выдачи —
+    бинарный поиск по времени и срез. Новые выдачи почти всегда самые
+    свежие, поэтому вставка в упорядоченный список идёт в его конец.
+
+    С ``source`` индекс ленивый, как TextIndex: строится из ``source()``
+    (выданные книги) при первом запросе; до того add/remove ничего не
+    делают, а remove возвращает None.
+    """
+
+    def __init__(self, lock: Optional[RLock] = None, source=None):
+        self._lock = lock or nullcontext()
+        self._source = source
+        self.invalidate()
+
+    @synchronized
+    def invalidate(self):
+        """Сбрасывает ленивый индекс: он построится заново при следующем запросе."""
+        self._loans: Dict[int, Loan] = {}
+        self._by_reader: Dict[int, Set[int]] = {}
+        self._by_time: List[Tuple[float, int]] = []
+        self._built = self._source is None
+
+    def _ensure_built(self):
+        if not self._built:
+            self.rebuild(self._source())
+
+    @synchronized
+    def __len__(self):
+        self._ensure_built()
+        return len(self._loans)
+
+    @synchronized
+    def get(self, book_id: int) -> Optional[Loan]:
+        self._ensure_built()
+        return self._loans.get(book_id)
+
+    @synchronized
+    def add(self, book_id: int, reader_id: int, borrowed_at: float):
+        if not self._built:
+            return
+        self.remove(book_id)
+        self._loans[book_id] = Loan(book_id, reader_id, borrowed_at)
+        self._by_reader.setdefault(reader_id, set()).add(book_id)
+        bisect.insort(self._by_time, (borrowed_at, book_id))
+
+    @synchronized
+    def remove(self, book_id: int) -> Optional[Loan]:
+        loan = self._loans.pop(book_id, None)
+        if loan is None:
+            return None
+        books = self._by_reader[loan.reader_id]
+        books.discard(book_id)
+        if not books:
+            del self._by_reader[loan.reader_id]
+        del self._by_time[bisect.bisect_left(self._by_time, (loan.borrowed_at, book_id))]
+        return loan
+
+    @synchronized
+    def rebuild(self, books: Iterable[Book]):
+        """Индекс по выданным книгам; неизвестное время выдачи считается самым старым."""
+        self._loans, self._by_reader = {}, {}
+        for book in books:
+            if book.status == BookStatus.BORROWED and book.borrower_id is not None:
+                loan = Loan(book.id, book.borrower_id, book.borrowed_at or 0.0)
+                self._loans[book.id] = loan
+                self._by_reader.setdefault(loan.reader_id, set()).add(book.id)
+        self._by_time = sorted((loan.borrowed_at, loan.book_id) for loan in self._loans.values())
+        self._built = True
+
+    @synchronized
+    def books_of(self, reader_id: int) -> List[int]:
+        self._ensure_built()
+        return sorted(self._by_reader.get(reader_id, ()))
+
+    @synchronized
+    def borrowed_before(self, timestamp: float) -> List[Loan]:
+        """Выдачи раньше timestamp, от самых старых."""
+        self._ensure_built()
+        end = bisect.bisect_left(self._by_time, (timestamp,))
+        return [self._loans[book_id] for _, book_id in self._by_time[:end]]
+
+# ==================== ЖУРНАЛ ИЗМЕНЕНИЙ (WAL) ====================
+class LibraryJournal:
+    """Журнал изменений в формате JSON Lines поверх периодического снимка.
+
+    Каждое изменение — одна строка ``{"seq", "op", "kind", ...}``:
+    ``put`` с полной сущностью или ``delete`` с id. Снимок (формат
+    ``save_state`` + ``journal_seq``) пишется атомарно через временный файл
+    и ``os.replace``; после этого из журнала убираются уже вошедшие в
+    снимок записи. Восстановление = снимок + записи с seq > journal_seq.
+    Оборванная при сбое последняя строка журнала игнорируется. Если после
+    сжатия журнал пуст, в нём остаётся запись ``checkpoint`` с seq снимка,
+    чтобы нумерация после перезапуска продолжилась, а не началась с нуля.
+    Сжатие целиком идёт в фоновом потоке: новый снимок собирается из
+    прежнего снимка и записей журнала, живые репозитории не читаются.
+    """
+
+    def __init__(self, snapshot_path: str = 'library_state.json', journal_path: Optional[str] = None,
+                 compact_every: int = 10000, fsync: bool = False):
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path or snapshot_path + '.journal'
+        self.compact_every = compact_every
+        self.fsync = fsync
+        self._lock = Lock()
+        self._batch_done = Condition(self._lock)
+        self.seq = 0
+        self._since_compaction = 0
+        self._recover()
+        self._file = open(self.journal_path, 'a', encoding='utf-8')
+        self._compactor: Optional[Thread] = None
+        self._pending: Optional[List[str]] = None  # строки незавершённого пакета
+        self._pending_owner: Optional[int] = None  # поток, открывший пакет
+        self._pending_start = 0  # seq перед первой записью пакета
+
+    def _recover(self):
+        """Находит последний seq и отрезает оборванную при сбое строку, чтобы
+        новые записи не оказались за ней (и не потерялись при восстановлении).
+        seq не может быть меньше journal_seq снимка: иначе новые записи
+        получили бы уже «поглощённые» снимком номера и не применились бы."""
+        self.seq = self._snapshot_seq()
+        valid = 0
+        try:
+            with open(self.journal_path, 'rb') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break
+                    if not line.endswith(b'\n'):
+                        break
+                    valid += len(line)
+                    self.seq = max(self.seq, record['seq'])
+                    self._since_compaction += 1
+            if valid < os.path.getsize(self.journal_path):
+                os.truncate(self.journal_path, valid)
+        except FileNotFoundError:
+            pass
+
+    def _snapshot_seq(self) -> int:
+        """journal_seq снимка; он пишется первым ключом, так что читать весь
+        файл не нужно (кроме снимков старого формата, где ключ в конце)."""
+        try:
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                reader = StateReader(f)
+                for _ in reader:
+                    if 'journal_seq' in reader.scalars:
+                        break
+                return reader.scalars.get('journal_seq', 0)
+        except FileNotFoundError:
+            return 0
+
+    @property
+    def needs_compaction(self) -> bool:
+        return (self._since_compaction >= self.compact_every and not self.compacting
+                and self._pending is None)
+
+    @property
+    def compacting(self) -> bool:
+        return self._compactor is not None and self._compactor.is_alive()
+
+    def append(self, op: str, kind: str, entity=None, entity_id=None):
+        with self._lock:
+            self.seq += 1
+            record = {'seq': self.seq, 'op': op, 'kind': kind}
+            if op == 'put':
+                record['data'] = entity_to_dict(entity)
+            else:
+                record['id'] = entity_id
+            self._write_lines([json.dumps(record, ensure_ascii=False) + '\n'])
+
+    def append_many(self, kind: str, entities):
+        """Записи ``put`` для многих сущностей одной записью в файл."""
+        with self._lock:
+            lines = []
+            for entity in entities:
+                self.seq += 1
+                record = {'seq': self.seq, 'op': 'put', 'kind': kind, 'data': entity_to_dict(entity)}
+                lines.append(json.dumps(record, ensure_ascii=False) + '\n')
+            self._write_lines(lines)
+
+    def _write_lines(self, lines: List[str]):
+        """Вызывается под self._lock; внутри пакета строки только копятся."""
+        if self._pending is not None and self._pending_owner == get_ident():
+            self._pending.extend(lines)
+            return
+        self._file.write(''.join(lines))
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self._since_compaction += len(lines)
+
+    @contextmanager
+    def batch(self):
+        """Записи внутри блока пишутся в файл одной записью при выходе;
+        при исключении они отбрасываются, а seq возвращается назад."""
+        if self._pending is not None and self._pending_owner == get_ident():
+            yield  # вложенный пакет сливается с внешним
+            return
+        with self._lock:
+            while self._pending is not None:  # пакет другого потока
+                self._batch_done.wait()
+            self._pending, self._pending_owner = [], get_ident()
+            start_seq = self._pending_start = self.seq
+        try:
+            yield
+        except BaseException:
+            with self._lock:
+                if self.seq == start_seq + len(self._pending):  # другие потоки не писали
+                    self.seq = start_seq
+                self._pending = self._pending_owner = None
+                self._batch_done.notify_all()
+            raise
+        with self._lock:
+            lines, self._pending, self._pending_owner = self._pending, None, None
+            self._batch_done.notify_all()
+            if lines:
+                self._write_lines(lines)
+
+    def sync(self):
+        """Гарантирует, что все записи журнала на диске."""
+        with self._lock:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def records_after(self, seq: int):
+        try:
+            f = open(self.journal_path, 'r', encoding='utf-8')
+        except FileNotFoundError:
+            return
+        with f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break  # недописанная строка после сбоя
+                if record['seq'] > seq:
+                    yield record
+
+    def write_snapshot(self, state: Dict[str, Any], seq: int):
+        """Атомарно пишет снимок, затем обрезает журнал до записей после seq."""
+        state = {'journal_seq': seq, **state}
+        tmp_path = self.snapshot_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        with self._lock:
+            self._file.flush()
+            tail = list(self.records_after(seq)) or [{'seq': seq, 'op': 'checkpoint'}]
+            tmp_path = self.journal_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.writelines(json.dumps(r, ensure_ascii=False) + '\n' for r in tail)
+            self._file.close()
+            os.replace(tmp_path, self.journal_path)
+            self._file = open(self.journal_path, 'a', encoding='utf-8')
+            self._since_compaction = len(tail)
+
+    def merged_state(self, seq: int) -> Dict[str, Any]:
+        """Состояние на момент seq: прежний снимок плюс записи журнала с
+        номерами до seq. Записи пакета попадают в файл при его завершении,
+        так что порядок строк не обязан совпадать с seq — журнал читается целиком."""
+        state: Dict[str, Dict[int, Any]] = {kind: {} for kind in ('books', 'librarians', 'readers')}
+        snapshot_seq = 0
+        try:
+            f = open(self.snapshot_path, 'r', encoding='utf-8')
+        except FileNotFoundError:
+            f = None
+        if f is not None:
+            with f, gc_paused():
+                reader = StateReader(f)
+                for kind, item in reader:
+                    if kind in state:
+                        state[kind][item['id']] = item
+                snapshot_seq = reader.scalars.get('journal_seq', 0)
+        for record in self.records_after(snapshot_seq):
+            if record['seq'] > seq:
+                continue
+            if record['op'] == 'put':
+                state[record['kind']][record['data']['id']] = record['data']
+            elif record['op'] == 'delete':
+                state[record['kind']].pop(record['id'], None)
+        return {kind: [items[i] for i in sorted(items)] for kind, items in state.items()}
+
+    def _compact(self, seq: int):
+        self.write_snapshot(self.merged_state(seq), seq)
+
+    def compact(self, background: bool = True):
+        """Новый снимок по всем записанным изменениям; с background — в фоновом потоке."""
+        self.wait()
+        with self._lock:
+            # Строки незавершённого пакета ещё не в файле — снимок берёт всё до него
+            seq = self.seq if self._pending is None else self._pending_start
+        if background:
+            self._compactor = Thread(target=self._compact, args=(seq,),
+                                     name='library-journal-compactor', daemon=True)
+            self._compactor.start()
+        else:
+            self._compact(seq)
+
+    def wait(self):
+        if self._compactor is not None:
+            self._compactor.join()
+            self._compactor = None
+
+    def close(self):
+        self.wait()
+        with self._lock:
+            self._file.close()
+
 # ==================== ФАСАД ====================
 class LibraryFacade:
-    def __init__(self):
-        self.books = BookRepository()
-        self.librarians = LibrarianRepository()
-        self.readers = ReaderRepository()
+    def __init__(self, backend: Optional[RepositoryFactory] = None, columnar_books: bool = False,
+                 journal: Optional[LibraryJournal] = None, async_notify: bool = False,
+                 thread_safe: bool = False):
+        # backend выбирает хранилище; по умолчанию — в памяти
+        self.backend = backend or InMemoryRepositoryFactory(columnar_books=columnar_books,
+                                                            thread_safe=thread_safe)
+        # thread_safe: блокировки по сущностям (полосам) вместо одной общей —
+        # выдачи разных книг не ждут друг друга
+        self.thread_safe = thread_safe
+        self.entity_locks = StripedLock() if thread_safe else None
+        self._compact_lock = Lock()
+        # journal: каждое изменение дописывается в журнал, save_state стоит O(изменений)
+        self.journal = journal
+        self.books = self.backend.create_books()
+        self.librarians = self.backend.create_librarians()
+        self.readers = self.backend.create_readers()
         self.observers: List[Observer] = []
+        # async_notify: лог и наблюдатели вызываются в фоновом потоке пачками
+        self.dispatcher = EventDispatcher(self.observers) if async_notify else None
+        self._batch = local()  # события текущего пакета — свои у каждого потока
+        # Полнотекстовые индексы: книги — по названию и автору, люди — по имени.
+        # Индексы ленивые: строятся по репозиториям при первом запросе, так что
+        # запуск над большой БД SQLite не читает каталог в память
+        self.text_indexes: Dict[str, TextIndex] = {
+            'books': TextIndex(self._new_lock(),
+                               lambda: ((b.id, b.title, b.author) for b in self.books.get_all())),
+            'readers': TextIndex(self._new_lock(),
+                                 lambda: ((r.id, r.name) for r in self.readers.get_all())),
+            'librarians': TextIndex(self._new_lock(),
+                                    lambda: ((l.id, l.name) for l in self.librarians.get_all())),
+        }
+        # Текущие выдачи: книги читателя и просроченные выдачи без перебора книг
+        # (строится только по выданным книгам — в SQLite через индекс статуса)
+        self.clock = time.time
+        self.loans = LoanIndex(self._new_lock(),
+                               lambda: self.books.search(status=BookStatus.BORROWED))
+        # Журнал — источник истины: состояние восстанавливается сразу, иначе
+        # изменения до load_state() получили бы уже занятые id и при
+        # воспроизведении журнала затёрли бы существующие сущности
+        if self.journal is not None:
+            self.load_state()
 
     def add_observer(self, observer: Observer):
         self.observers.append(observer)
 
     def notify(self, message: str):
+        events = getattr(self._batch, 'events', None)
+        if events is not None:
+            events.append(message)
+            return
+        if self.dispatcher is not None:
+            self.dispatcher.dispatch(message)
+            return
         log(message)
         for obs in self.observers:
             obs.update(message)
 
+    def flush_events(self, timeout: Optional[float] = None) -> bool:
+        """Ждёт доставки всех событий (в синхронном режиме — сразу True)."""
+        return self.dispatcher.flush(timeout) if self.dispatcher is not None else True
+
+    def close(self):
+        if self.dispatcher is not None:
+            self.dispatcher.close()
+
+    @contextmanager
+    def batch(self):
+        """Изменения внутри блока — один пакет: события не рассылаются, а
+        копятся в выдаваемом списке (итоговое сообщение шлёт вызывающий),
+        записи журнала пишутся одной записью при выходе и отбрасываются
+        при исключении, а хранилище с транзакциями (SQLite) откатывает их
+        целиком. Изменения в памяти откатывает вызывающий — см. CommandQueue.
+        Пакет рассчитан на одного пишущего: в режиме thread_safe записи
+        других потоков в него не попадают и пишутся сразу. Исключение —
+        хранилище с транзакциями: соединение общее, и на время пакета фасад
+        захватывает все блокировки сущностей — раньше блокировки соединения,
+        в том же порядке, что и одиночные операции (полоса, затем соединение).
+        """
+        events = getattr(self._batch, 'events', None)
+        if events is not None:
+            yield events
+            return
+        exclusive = self.entity_locks is not None and self.backend.transactional
+        events = self._batch.events = []
+        try:
+            with (self.entity_locks.hold_all() if exclusive else nullcontext()):
+                try:
+                    with self.backend.transaction(), \
+                            (self.journal.batch() if self.journal is not None else nullcontext()):
+                        yield events
+                except BaseException:
+                    if self.backend.transactional:
+                        # Транзакция откатилась целиком — индексы в памяти строятся заново по БД
+                        self._rebuild_derived_indexes()
+                    raise
+        finally:
+            self._batch.events = None
+        if self.journal is not None:
+            self._maybe_compact()
+
+    # ----------------- JOURNAL -----------------
+    def _journal_put(self, kind: str, entity):
+        if self.journal is not None:
+            self.journal.append('put', kind, entity=entity)
+            self._maybe_compact()
+
+    def _journal_put_many(self, kind: str, entities):
+        if self.journal is not None and entities:
+            self.journal.append_many(kind, entities)
+            self._maybe_compact()
+
+    def _journal_delete(self, kind: str, entity_id: int):
+        if self.journal is not None:
+            self.journal.append('delete', kind, entity_id=entity_id)
+            self._maybe_compact()
+
+    def _maybe_compact(self):
+        if self.journal.needs_compaction and self._compact_lock.acquire(blocking=False):
+            try:
+                if self.journal.needs_compaction:
+                    self.compact()
+            finally:
+                self._compact_lock.release()
+
+    def compact(self, background: bool = True):
+        """Новый снимок в журнальном режиме. Его собирает поток журнала из
+        прежнего снимка и записей, поэтому запрос, на котором сработал
+        compact_every, не платит за обход каталога."""
+        if self.journal is not None:
+            self.journal.compact(background=background)
+
+    # ----------------- LOCKS -----------------
+    def _hold(self, *keys):
+        """Блокировки сущностей ('books', id), ('readers', id)... в режиме thread_safe."""
+        return self.entity_locks.hold(*keys) if self.entity_locks is not None else nullcontext()
+
+    def _new_lock(self) -> Optional[RLock]:
+        return RLock() if self.thread_safe else None
+
     # ----------------- BOOK -----------------
     def add_book(self, title, author, year, isbn) -> Book:
         book = Book(0, title, author, year, isbn)
         self.books.add(book)
+        self.text_indexes['books'].add(book.id, book.title, book.author)
+        self._journal_put('books', book)
         self.notify(f"Book added: {book.title}")
         return book
 
+    def add_books(self, books: Iterable[Tuple[str, str, int, str]]) -> List[Book]:
+        """Пакетное добавление (title, author, year, isbn) с одним событием на пакет."""
+        added = [Book(0, title, author, year, isbn) for title, author, year, isbn in books]
+        self.books.bulk_add(added)
+        self.text_indexes['books'].bulk_add((b.id, b.title, b.author) for b in added)
+        self._journal_put_many('books', added)
+        self.notify(f"Books added: {len(added)}")
+        return added
+
     def update_book(self, book: Book):
-        self.books.update(book)
+        with self._hold(('books', book.id)):
+            self.books.update(book)
+            if self.books.get(book.id) is not None:
+                self.text_indexes['books'].add(book.id, book.title, book.author)
+                if book.status == BookStatus.BORROWED and book.borrower_id is not None:
+                    self.loans.add(book.id, book.borrower_id, book.borrowed_at or 0.0)
+                else:
+                    self.loans.remove(book.id)
+                self._journal_put('books', book)
         self.notify(f"Book updated: {book.title}")
 
     def delete_book(self, book_id: int):
-        book = self.books.get(book_id)
+        with self._hold(('books', book_id)):
+            book = self.books.get(book_id)
+            if book:
+                self.books.delete(book_id)
+                self.text_indexes['books'].remove(book_id)
+                self.loans.remove(book_id)
+                self._journal_delete('books', book_id)
         if book:
-            self.books.delete(book_id)
             self.notify(f"Book deleted: {book.title}")
 
-    def borrow_book(self, reader_id, book_id):
+    def _borrow(self, reader_id, book_id, borrowed_at: Optional[float] = None) -> Optional[Tuple[Book, Reader]]:
         book = self.books.get(book_id)
         reader = self.readers.get(reader_id)
         if book and reader and book.status == BookStatus.AVAILABLE:
             book.status = BookStatus.BORROWED
             book.borrower_id = reader_id
+            book.borrowed_at = self.clock() if borrowed_at is None else borrowed_at
             reader.books_borrowed.append(book_id)
             self.books.update(book)
             self.readers.update(reader)
+            self.loans.add(book_id, reader_id, book.borrowed_at)
+            return book, reader
+        return None
+
+    def borrow_book(self, reader_id, book_id, borrowed_at: Optional[float] = None):
+        """borrowed_at — время выдачи (по умолчанию текущее), например при импорте."""
+        # Проверка статуса и выдача — под блокировками книги и читателя
+        with self._hold(('books', book_id), ('readers', reader_id)):
+            borrowed = self._borrow(reader_id, book_id, borrowed_at)
+            if borrowed:
+                self._journal_put('books', borrowed[0])
+                self._journal_put('readers', borrowed[1])
+        if borrowed:
+            book, reader = borrowed
             self.notify(f"Book '{book.title}' borrowed by {reader.name}")
             return True
         return False
 
+    def borrow_many(self, loans: Iterable[Tuple[int, int]]) -> int:
+        """Выдача по парам (reader_id, book_id) с одним событием на пакет;
+        возвращает число выданных книг."""
+        books: List[Book] = []
+        readers: Dict[int, Reader] = {}
+        requested = 0
+        for reader_id, book_id in loans:
+            requested += 1
+            with self._hold(('books', book_id), ('readers', reader_id)):
+                borrowed = self._borrow(reader_id, book_id)
+                if borrowed and self.thread_safe:
+                    # порядок записей журнала должен совпадать с порядком изменений
+                    self._journal_put('books', borrowed[0])
+                    self._journal_put('readers', borrowed[1])
+            if borrowed:
+                books.append(borrowed[0])
+                readers[reader_id] = borrowed[1]
+        if not self.thread_safe:
+            self._journal_put_many('books', books)
+            self._journal_put_many('readers', list(readers.values()))
+        self.notify(f"Books borrowed: {len(books)} of {requested}")
+        return len(books)
+
     def return_book(self, book_id):
-        book = self.books.get(book_id)
-        if book and book.status == BookStatus.BORROWED:
-            reader = self.readers.get(book.borrower_id)
-            if reader and book_id in reader.books_borrowed:
-                reader.books_borrowed.remove(book_id)
-                self.readers.update(reader)
-            book.status = BookStatus.AVAILABLE
-            book.borrower_id = None
-            self.books.update(book)
-            self.notify(f"Book '{book.title}' returned")
-            return True
-        return False
+        while True:
+            book = self.books.get(book_id)
+            if not book or book.status != BookStatus.BORROWED:
+                return False
+            reader_id = book.borrower_id
+            with self._hold(('books', book_id), ('readers', reader_id)):
+                book = self.books.get(book_id)
+                if not book or book.status != BookStatus.BORROWED:
+                    return False
+                if book.borrower_id != reader_id:
+                    continue  # книгу успели вернуть и выдать другому — берём новые блокировки
+                loan = self.loans.remove(book_id)
+                reader = self.readers.get(loan.reader_id if loan else reader_id)
+                if reader:
+                    try:
+                        # books_borrowed — сохраняемый список, поэтому удаление
+                        # остаётся его обходом; отдельная проверка `in` не нужна
+                        reader.books_borrowed.remove(book_id)
+                    except ValueError:
+                        pass
+                    else:
+                        self.readers.update(reader)
+                        self._journal_put('readers', reader)
+                book.status = BookStatus.AVAILABLE
+                book.borrower_id = None
+                book.borrowed_at = None
+                self.books.update(book)
+                self._journal_put('books', book)
+                break
+        self.notify(f"Book '{book.title}' returned")
+        return True
 
     # ----------------- LIBRARIAN -----------------
     def add_librarian(self, name, email, phone, position):
         librarian = Librarian(0, name, email, phone, position)
         self.librarians.add(librarian)
+        self.text_indexes['librarians'].add(librarian.id, librarian.name)
+        self._journal_put('librarians', librarian)
         self.notify(f"Librarian added: {name}")
         return librarian
 
     def update_librarian(self, librarian: Librarian):
-        self.librarians.update(librarian)
+        with self._hold(('librarians', librarian.id)):
+            self.librarians.update(librarian)
+            if self.librarians.get(librarian.id) is not None:
+                self.text_indexes['librarians'].add(librarian.id, librarian.name)
+                self._journal_put('librarians', librarian)
         self.notify(f"Librarian updated: {librarian.name}")
 
     def delete_librarian(self, librarian_id: int):
-        librarian = self.librarians.get(librarian_id)
+        with self._hold(('librarians', librarian_id)):
+            librarian = self.librarians.get(librarian_id)
+            if librarian:
+                self.librarians.delete(librarian_id)
+                self.text_indexes['librarians'].remove(librarian_id)
+                self._journal_delete('librarians', librarian_id)
         if librarian:
-            self.librarians.delete(librarian_id)
             self.notify(f"Librarian deleted: {librarian.name}")
 
     # ----------------- READER -----------------
     def add_reader(self, name, email, phone):
         reader = Reader(0, name, email, phone, [])
         self.readers.add(reader)
+        self.text_indexes['readers'].add(reader.id, reader.name)
+        self._journal_put('readers', reader)
         self.notify(f"Reader added: {name}")
         return reader
 
+    def add_readers(self, readers: Iterable[Tuple[str, str, str]]) -> List[Reader]:
+        """Пакетное добавление (name, email, phone) с одним событием на пакет."""
+        added = [Reader(0, name, email, phone, []) for name, email, phone in readers]
+        self.readers.bulk_add(added)
+        self.text_indexes['readers'].bulk_add((r.id, r.name) for r in added)
+        self._journal_put_many('readers', added)
+        self.notify(f"Readers added: {len(added)}")
+        return added
+
     def update_reader(self, reader: Reader):
-        self.readers.update(reader)
+        with self._hold(('readers', reader.id)):
+            self.readers.update(reader)
+            if self.readers.get(reader.id) is not None:
+                self.text_indexes['readers'].add(reader.id, reader.name)
+                self._journal_put('readers', reader)
         self.notify(f"Reader updated: {reader.name}")
 
     def delete_reader(self, reader_id: int):
-        reader = self.readers.get(reader_id)
+        with self._hold(('readers', reader_id)):
+            reader = self.readers.get(reader_id)
+            if reader:
+                self.readers.delete(reader_id)
+                self.text_indexes['readers'].remove(reader_id)
+                self._journal_delete('readers', reader_id)
         if reader:
-            self.readers.delete(reader_id)
             self.notify(f"Reader deleted: {reader.name}")
 
+    # ----------------- LOANS -----------------
+    def reader_books(self, reader_id: int) -> List[Book]:
+        """Книги, которые сейчас на руках у читателя."""
+        return [self.books.get(book_id) for book_id in self.loans.books_of(reader_id)]
+
+    def overdue_loans(self, days: float = 30, now: Optional[float] = None) -> List[Loan]:
+        """Выдачи старше days дней, от самых старых."""
+        return self.loans.borrowed_before((self.clock() if now is None else now) - days * 86400)
+
+    # ----------------- SEARCH -----------------
+    def iter_search(self, entity: str = 'books', limit: Optional[int] = None, offset: int = 0,
+                    after_id: Optional[int] = None, **criteria):
+        """Потоковый поиск по равенству полей; entity — books/readers/librarians."""
+        return getattr(self, entity).iter_search(limit=limit, offset=offset, after_id=after_id, **criteria)
+
+    def query(self, query: Query, entity: str = 'books') -> List:
+        """Запрос с условиями Eq/Range/In/Prefix, сортировкой и limit."""
+        return getattr(self, entity).query(query)
+
+    def export_search(self, path: str, entity: str = 'books',
+                      exporter: Union[str, SearchExporter] = 'jsonl', limit: Optional[int] = None,
+                      offset: int = 0, after_id: Optional[int] = None, **criteria) -> int:
+        """Пишет результаты поиска в файл по мере получения; exporter — 'jsonl',
+        'csv' или свой SearchExporter. Возвращает число записанных сущностей."""
+        if isinstance(exporter, str):
+            exporter = EXPORTERS[exporter]()
+        count = exporter.export(self.iter_search(entity, limit, offset, after_id, **criteria), path, entity)
+        self.notify(f"Search results exported: {count} {entity} to {path}")
+        return count
+
+    def full_text_search(self, query: str, entity: str = 'books', prefix: bool = False,
+                         limit: Optional[int] = None):
+        """Поиск по словам (AND) с ранжированием; entity — books/readers/librarians."""
+        repository = getattr(self, entity)
+        ranked = self.text_indexes[entity].search(query, prefix=prefix, limit=limit)
+        return [repository.get(doc_id) for doc_id, _ in ranked]
+
+    def _rebuild_derived_indexes(self):
+        """Полнотекстовые индексы и индекс выдач построятся заново по
+        репозиториям при следующем запросе."""
+        for index in self.text_indexes.values():
+            index.invalidate()
+        self.loans.invalidate()
+
     # ----------------- STATE -----------------
-    def save_state(self, filename='library_state.json'):
-        state = {
-            'books': [
-                {**b.__dict__, 'status': b.status.value} for b in self.books.get_all()
-            ],
-            'librarians': [l.__dict__ for l in self.librarians.get_all()],
-            'readers': [r.__dict__ for r in self.readers.get_all()]
+    def _capture_state(self) -> Dict[str, Any]:
+        return {
+            'books': [entity_to_dict(b) for b in self.books.get_all()],
+            'librarians': [entity_to_dict(l) for l in self.librarians.get_all()],
+            'readers': [entity_to_dict(r) for r in self.readers.get_all()]
         }
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(state, f, indent=2, ensure_ascii=False)
+
+    def save_state(self, filename=None):
+        if self.journal is not None and filename in (None, self.journal.snapshot_path):
+            # Все изменения уже в журнале: достаточно сбросить его на диск
+            self.journal.sync()
+            self.notify("Library state saved")
+            return
+        with open(filename or 'library_state.json', 'w', encoding='utf-8') as f:
+            json.dump(self._capture_state(), f, indent=2, ensure_ascii=False)
         self.notify("Library state saved")
 
-    def load_state(self, filename='library_state.json'):
+    def load_state(self, filename=None):
+        if filename is None:
+            filename = self.journal.snapshot_path if self.journal is not None else 'library_state.json'
+        started = time.perf_counter()
         try:
-            with open(filename, 'r', encoding='utf-8') as f:
-                state = json.load(f)
-                # Load books
-                self.books = BookRepository()
-                for item in state['books']:
-                    item['status'] = BookStatus(item['status'])
-                    book = Book(**item)
-                    self.books.add(book)
-                    self.books.next_id = max(self.books.next_id, book.id + 1)
-                # Load librarians
-                self.librarians = LibrarianRepository()
-                for item in state['librarians']:
-                    librarian = Librarian(**item)
-                    self.librarians.add(librarian)
-                    self.librarians.next_id = max(self.librarians.next_id, librarian.id + 1)
-                # Load readers
-                self.readers = ReaderRepository()
-                for item in state['readers']:
-                    reader = Reader(**item)
-                    self.readers.add(reader)
-                    self.readers.next_id = max(self.readers.next_id, reader.id + 1)
-            self.notify("Library state loaded")
+            f = open(filename, 'r', encoding='utf-8')
         except FileNotFoundError:
-            self.notify("No saved state found")
+            if self.journal is None:
+                self.notify("No saved state found")
+                return
+            f = None  # снимка ещё нет — всё состояние в журнале
+        loaded, snapshot_seq = 0, 0
+        # Состояние грузится в новые репозитории: если файл оборван или
+        # испорчен, исключение вылетит до подмены и фасад останется прежним
+        with self.backend.replacing() as (books, librarians, readers):
+            repositories = {'books': books, 'librarians': librarians, 'readers': readers}
+            if f is not None:
+                with f, gc_paused():
+                    # Файл разбирается потоком; bulk_load сохраняет id из файла
+                    # (на них ссылаются записи журнала) и строит индексы один раз
+                    reader = StateReader(f)
+                    for kind, items in groupby(reader, key=itemgetter(0)):
+                        if kind in repositories:
+                            loaded += repositories[kind].bulk_load(
+                                entity_from_dict(kind, item) for _, item in items)
+                    snapshot_seq = reader.scalars.get('journal_seq', 0)
+            if self.journal is not None:
+                self.journal.wait()
+                for record in self.journal.records_after(snapshot_seq):
+                    if record['op'] == 'put':
+                        repositories[record['kind']].put(entity_from_dict(record['kind'], record['data']))
+                    elif record['op'] == 'delete':
+                        repositories[record['kind']].delete(record['id'])
+                    else:
+                        continue  # checkpoint
+                    loaded += 1
+        self.books, self.librarians, self.readers = books, librarians, readers
+        self._rebuild_derived_indexes()
+        if self.journal is not None and filename != self.journal.snapshot_path:
+            # Загружен посторонний файл: журнал сжимается из снимка и записей,
+            # поэтому новое состояние сразу становится снимком журнала
+            self.journal.wait()
+            self.journal.write_snapshot(self._capture_state(), self.journal.seq)
+        elapsed = time.perf_counter() - started
+        self.notify(f"Library state loaded: {loaded} records in {elapsed:.2f}s "
+                    f"({loaded / elapsed if elapsed else 0:.0f} records/s)")
 
 # ==================== КОМАНДЫ ====================
 class AddBookCommand(Command):
@@ -290,20 +2209,219 @@ class AddBookCommand(Command):
         self.author = author
         self.year = year
         self.isbn = isbn
-    def execute(self): self.facade.add_book(self.title, self.author, self.year, self.isbn)
+        self.book: Optional[Book] = None
+    def execute(self): self.book = self.facade.add_book(self.title, self.author, self.year, self.isbn)
+    def undo(self):
+        if self.book is not None:
+            self.facade.delete_book(self.book.id)
+            self.book = None
 
 class BorrowBookCommand(Command):
     def __init__(self, facade: LibraryFacade, reader_id, book_id):
         self.facade = facade
         self.reader_id = reader_id
         self.book_id = book_id
-    def execute(self): self.facade.borrow_book(self.reader_id, self.book_id)
+        self.borrowed = False
+    def execute(self): self.borrowed = self.facade.borrow_book(self.reader_id, self.book_id)
+    def undo(self):
+        if self.borrowed:
+            self.facade.return_book(self.book_id)
+            self.borrowed = False
 
 class ReturnBookCommand(Command):
     def __init__(self, facade: LibraryFacade, book_id):
         self.facade = facade
         self.book_id = book_id
-    def execute(self): self.facade.return_book(self.book_id)
+        self.reader_id: Optional[int] = None
+        self.borrowed_at: Optional[float] = None
+        self.returned = False
+    def execute(self):
+        book = self.facade.books.get(self.book_id)
+        if book:
+            self.reader_id, self.borrowed_at = book.borrower_id, book.borrowed_at
+        self.returned = self.facade.return_book(self.book_id)
+    def undo(self):
+        if self.returned:
+            self.facade.borrow_book(self.reader_id, self.book_id, borrowed_at=self.borrowed_at)
+            self.returned = False
+
+@dataclass(slots=True)
+class BatchReport:
+    commands: int
+    seconds: float
+    depth: int  # команд в очереди после пакета
+
+class CommandQueue:
+    """Invoker: очередь команд, выполняемых пакетами по ``batch_size``.
+
+    Пакет выполняется внутри ``facade.batch()``: одно итоговое событие
+    вместо события на каждую команду и одна запись в журнал. Если команда
+    бросает исключение, уже выполненные команды пакета отменяются (undo в
+    обратном порядке), записи журнала пакета отбрасываются, а исключение
+    пробрасывается дальше. Если пакет упал уже при фиксации (запись журнала,
+    COMMIT), в памяти откатываются все его команды. Команды пакета, которые
+    в итоге не применены (кроме упавшей), возвращаются в начало очереди:
+    после исключения ``depth`` показывает, сколько осталось, и ``run()``
+    можно вызвать снова. Если же какая-то отмена сама упала, откат неполон:
+    тогда пакет (вместе с удавшимися отменами) фиксируется в журнале, чтобы
+    состояние на диске совпало с памятью, а исходное исключение всё равно
+    пробрасывается.
+    """
+
+    def __init__(self, facade: LibraryFacade, batch_size: int = 1000):
+        self.facade = facade
+        self.batch_size = batch_size
+        self._commands: deque = deque()
+        self.batches = 0
+        self.executed = 0
+        self.failed_batches = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    @property
+    def depth(self) -> int:
+        return len(self._commands)
+
+    def submit(self, command: Command):
+        self._commands.append(command)
+
+    def submit_many(self, commands: Iterable[Command]):
+        self._commands.extend(commands)
+
+    def run_batch(self) -> BatchReport:
+        batch = [self._commands.popleft() for _ in range(min(self.batch_size, len(self._commands)))]
+        started = time.perf_counter()
+        executed: List[Command] = []
+        failure: Optional[BaseException] = None
+        undo_failures = 0
+        try:
+            with self.facade.batch():
+                try:
+                    for command in batch:
+                        command.execute()
+                        executed.append(command)
+                except BaseException as error:
+                    failure = error
+                    undo_failures = self._undo(executed)
+                    if not undo_failures:
+                        raise
+        except Exception as error:
+            if failure is None:
+                # Упала фиксация пакета: SQLite уже откатила транзакцию (и фасад
+                # перестроил индексы), в памяти команды отменяются здесь
+                failure = error
+                if not self.facade.backend.transactional:
+                    undo_failures = self._undo(executed)
+            self._requeue(batch, executed, undo_failures)
+            self.failed_batches += 1
+            self.facade.notify(f"Batch rolled back: {len(batch)} commands ({failure!r}), "
+                               f"queue depth {self.depth}")
+            raise
+        if failure is not None:
+            self._requeue(batch, executed, undo_failures)
+            self.failed_batches += 1
+            self.facade.notify(f"Batch partially rolled back: {undo_failures} undo failures "
+                               f"({failure!r}), queue depth {self.depth}")
+            raise failure
+        report = BatchReport(len(batch), time.perf_counter() - started, self.depth)
+        self.batches += 1
+        self.executed += report.commands
+        self.total_seconds += report.seconds
+        self.max_seconds = max(self.max_seconds, report.seconds)
+        self.facade.notify(f"Batch committed: {report.commands} commands in "
+                           f"{report.seconds * 1000:.1f} ms, queue depth {report.depth}")
+        return report
+
+    def _requeue(self, batch: List[Command], executed: List[Command], undo_failures: int):
+        """Возвращает в начало очереди команды пакета, не оставившие следа:
+        не дошедшие до выполнения и (если откат полный) отменённые. Команда,
+        на которой пакет упал, не возвращается — иначе run() падал бы на ней снова."""
+        pending = batch[len(executed) + 1:]
+        if not undo_failures:
+            pending = executed + pending
+        self._commands.extendleft(reversed(pending))
+
+    @staticmethod
+    def _undo(executed: List[Command]) -> int:
+        """Отменяет команды в обратном порядке; сбой одной отмены не мешает
+        остальным. Возвращает число неудавшихся отмен."""
+        failures = 0
+        for command in reversed(executed):
+            try:
+                command.undo()
+            except Exception:
+                failures += 1
+                logging.exception("Undo failed for %r", command)
+        return failures
+
+    def run(self) -> List[BatchReport]:
+        """Выполняет всю очередь."""
+        reports = []
+        while self._commands:
+            reports.append(self.run_batch())
+        return reports
+
+    def consume(self, commands: Iterable[Command]) -> List[BatchReport]:
+        """Выполняет поток команд пакетами, не читая его целиком в память.
+        При ошибке уже прочитанные, но не применённые команды остаются в
+        очереди, а поток дальше не читается — продолжить можно с того же
+        итератора."""
+        iterator = iter(commands)
+        reports = []
+        while True:
+            self._commands.extend(islice(iterator, max(0, self.batch_size - len(self._commands))))
+            if not self._commands:
+                return reports
+            reports.append(self.run_batch())
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            'depth': self.depth,
+            'batches': self.batches,
+            'executed': self.executed,
+            'failed_batches': self.failed_batches,
+            'avg_batch_seconds': self.total_seconds / self.batches if self.batches else 0.0,
+            'max_batch_seconds': self.max_seconds,
+        }
+
+# ==================== СТРЕСС-ТЕСТ ====================
+def test_concurrent_borrow(threads: int = 8, operations: int = 2000, books: int = 100, readers: int = 20,
+                           columnar_books: bool = False):
+    """Потоки наперегонки выдают и возвращают книги через один фасад в режиме
+    thread_safe; в конце проверяется, что ни одна книга не выдана дважды и ни
+    одно изменение не потеряно. Демо его не запускает: ``python task3.py --stress``."""
+    with open(os.devnull, 'w', encoding='utf-8') as devnull, redirect_stdout(devnull):
+        facade = LibraryFacade(columnar_books=columnar_books, thread_safe=True)
+        facade.add_books((f"Книга {i}", f"Автор {i % 7}", 2000, f"ISBN-{i}") for i in range(books))
+        facade.add_readers((f"Читатель {i}", f"r{i}@mail.com", "") for i in range(readers))
+        counts = [[0, 0] for _ in range(threads)]  # [выдано, возвращено] по потокам
+
+        def worker(index: int):
+            rng = random.Random(index)
+            for _ in range(operations):
+                book_id = rng.randint(1, books)
+                if rng.random() < 0.5:
+                    counts[index][0] += facade.borrow_book(rng.randint(1, readers), book_id)
+                else:
+                    counts[index][1] += facade.return_book(book_id)
+
+        workers = [Thread(target=worker, args=(i,)) for i in range(threads)]
+        for t in workers:
+            t.start()
+        for t in workers:
+            t.join()
+
+    borrowed = [b for b in facade.books.get_all() if b.status == BookStatus.BORROWED]
+    holders = Counter(book_id for r in facade.readers.get_all() for book_id in r.books_borrowed)
+    assert all(n == 1 for n in holders.values()), "книга числится у двух читателей"
+    assert {b.id: b.borrower_id for b in borrowed} == \
+        {book_id: r.id for r in facade.readers.get_all() for book_id in r.books_borrowed}
+    assert sum(c[0] for c in counts) - sum(c[1] for c in counts) == len(borrowed), "потеряно изменение"
+    assert len(facade.books.search(status=BookStatus.BORROWED)) == len(borrowed), "индекс статуса расходится"
+    assert {loan.book_id: loan.reader_id for loan in facade.loans.borrowed_before(math.inf)} == \
+        {b.id: b.borrower_id for b in borrowed}, "индекс выдач расходится"
+    print(f"✅ Стресс-тест: {threads} потоков × {operations} операций, "
+          f"выдано {sum(c[0] for c in counts)}, на руках {len(borrowed)}\n")
 
 # ==================== ДЕМО ====================
 if __name__ == "__main__":
@@ -332,4 +2450,7 @@ if __name__ == "__main__":
     # Состояние библиотеки
     facade.save_state()
 
+    if "--stress" in sys.argv[1:]:
+        test_concurrent_borrow()
+
 